@@ -3,9 +3,12 @@
 import subprocess
 import time
 import os
+import json
 import shutil
+import datetime
 from dotenv import load_dotenv
 import logging
+import notifier
 
 load_dotenv('tanzimat.env')
 
@@ -26,18 +29,56 @@ os.environ['XAUTHORITY'] = os.path.expanduser('~/.Xauthority')
 # --- CONFIGURATION ---
 FIREFOX_BIN = "firefox"
 SAVE_DIR = os.path.expanduser("~/firefox_shots")
+MANIFEST_FILE = os.path.join(SAVE_DIR, "manifest.json")
+ACCOUNTS_FILE = os.path.expanduser("~/.config/scripts/adaccounts.json")
 
-PROFILE_1 = "default-esr"
-PROFILE_2 = "PH"
+# How many billing pages are loaded at the same time. Each one in flight
+# occupies its own desktop, so keep this at or below the number of spare
+# desktops.
+MAX_CONCURRENT = 3
+PAGE_LOAD_WAIT = 60
+WINDOW_APPEAR_TIMEOUT = 15
 
-URL_1 = "https://business.facebook.com/billing_hub/accounts/details?asset_id=662791603221806&business_id=1590396214928706&placement=ads_manager&payment_account_id=662791603221806"
-URL_2 = "https://business.facebook.com/billing_hub/accounts/details?asset_id=3943820015830789&business_id=697212649363732&placement=standalone&payment_account_id=3943820015830789"
+DEFAULT_ACCOUNTS = [
+    {
+        "name": "default",
+        "profile": "default-esr",
+        "url": "https://business.facebook.com/billing_hub/accounts/details?asset_id=662791603221806&business_id=1590396214928706&placement=ads_manager&payment_account_id=662791603221806",
+        "desktop": 3,
+        "scroll": 9,
+    },
+    {
+        "name": "PH",
+        "profile": "PH",
+        "url": "https://business.facebook.com/billing_hub/accounts/details?asset_id=3943820015830789&business_id=697212649363732&placement=standalone&payment_account_id=3943820015830789",
+        "desktop": 2,
+        "scroll": 9,
+    },
+]
 
 # --- HELPERS ---
-def notify(msg):
-    subprocess.run(["notify-send", "[Firefox Bot]", msg])
+_notifier = notifier.Notifier("[Firefox Bot]")
+
+def notify(msg, urgent=False):
+    _notifier.notify(msg, urgent=urgent)
     logging.info(f"Notification: {msg}")
 
+def load_accounts():
+    """
+    Read the ad accounts to capture. Each entry needs a name, a Firefox
+    profile and a billing URL; desktop and scroll are optional.
+    """
+    if not os.path.exists(ACCOUNTS_FILE):
+        os.makedirs(os.path.dirname(ACCOUNTS_FILE), exist_ok=True)
+        with open(ACCOUNTS_FILE, 'w') as f:
+            f.write(json.dumps(DEFAULT_ACCOUNTS, indent=2))
+        logging.info(f"Wrote default accounts config to {ACCOUNTS_FILE}")
+        return DEFAULT_ACCOUNTS
+    with open(ACCOUNTS_FILE, 'r') as f:
+        accounts = json.loads(f.read())
+    logging.info(f"Loaded {len(accounts)} accounts from {ACCOUNTS_FILE}")
+    return accounts
+
 def launch_firefox(profile, url):
     subprocess.Popen([FIREFOX_BIN, "-P", profile, "--no-remote", url])
     notify(f"🚀 Launched: {profile}")
@@ -48,16 +89,39 @@ def take_screenshot(name):
     subprocess.run(["scrot", full_path])
     notify(f"📸 Screenshot: {name}")
     logging.info(f"Took screenshot: {full_path}")
+    return full_path
 
-def get_all_visible_window_ids():
+def get_all_window_ids(onlyvisible=False):
+    cmd = ["xdotool", "search", "--class", "firefox"]
+    if onlyvisible:
+        cmd.insert(2, "--onlyvisible")
     try:
-        out = subprocess.check_output(["xdotool", "search", "--onlyvisible", "--class", "firefox"])
-        logging.info("Successfully retrieved visible Firefox window IDs.")
+        out = subprocess.check_output(cmd)
         return out.decode().strip().splitlines()
     except subprocess.CalledProcessError as e:
-        logging.error(f"Error getting visible Firefox window IDs: {e}")
+        # xdotool exits non-zero when nothing matches
+        logging.info(f"No Firefox windows found: {e}")
         return []
 
+def wait_for_new_window(known_ids, timeout=WINDOW_APPEAR_TIMEOUT):
+    """
+    Poll until a visible Firefox window that is not in known_ids shows up
+    and return its id. known_ids should hold every Firefox window, hidden
+    ones included, so only the freshly launched window counts; Firefox's
+    own hidden helper windows never do.
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        new_ids = [x for x in get_all_window_ids(onlyvisible=True) if x not in known_ids]
+        if new_ids:
+            return new_ids[-1]
+        time.sleep(0.5)
+    return None
+
+def close_window(win_id):
+    subprocess.run(["bspc", "node", win_id, "-c"])
+    logging.info(f"Closed window ID: {win_id}")
+
 def focus_window(win_id):
     subprocess.run(["xdotool", "windowactivate", win_id])
     time.sleep(0.5)
@@ -80,65 +144,121 @@ def press_down(win_id, times=9):
         time.sleep(0.1)
     logging.info(f"Finished pressing Down key on window ID: {win_id}")
 
+def open_batch(batch):
+    """
+    Launch every account in the batch and park each window on its own desktop.
+    Returns a list of (account, window id) for the windows that appeared.
+    """
+    opened = []
+    for account in batch:
+        known_ids = get_all_window_ids()
+        launch_firefox(account["profile"], account["url"])
+        win_id = wait_for_new_window(known_ids)
+        if not win_id:
+            notify(f"❌ No window appeared for {account['name']}", urgent=True)
+            logging.error(f"No Firefox window appeared for account {account['name']}.")
+            continue
+        subprocess.run(["bspc", "node", win_id, "-d", f"^{account['desktop']}"])
+        logging.info(f"Moved window {win_id} for {account['name']} to desktop {account['desktop']}.")
+        opened.append((account, win_id))
+    return opened
+
+def capture(account, win_id):
+    """
+    Bring the account's window up, scroll to the balances and screenshot it.
+    """
+    subprocess.run(["bspc", "desktop", "-f", f"^{account['desktop']}"])
+    time.sleep(1)
+    focus_window(win_id)
+    press_down(win_id, account.get("scroll", 9))
+    path = take_screenshot(f"{account['name']}.png")
+    logging.info(f"Captured account {account['name']} from window {win_id}.")
+    return path
+
+def check_profiles(accounts):
+    """
+    Firefox runs with --no-remote, so a profile can only be open once at a
+    time. Raise ValueError when two accounts share a profile.
+    """
+    by_profile = {}
+    for account in accounts:
+        by_profile.setdefault(account["profile"], []).append(account["name"])
+    shared = {profile: names for profile, names in by_profile.items() if len(names) > 1}
+    if shared:
+        details = "; ".join(f"{profile}: {', '.join(names)}" for profile, names in shared.items())
+        raise ValueError(f"Accounts share a Firefox profile, give each its own in {ACCOUNTS_FILE} ({details})")
+
+def write_manifest(entries):
+    with open(MANIFEST_FILE, 'w') as f:
+        f.write(json.dumps(entries, indent=2))
+    logging.info(f"Wrote manifest with {len(entries)} entries to {MANIFEST_FILE}")
+
+def assign_desktops(accounts):
+    """
+    Accounts without an explicit desktop get one from the pool of desktops
+    not claimed by any other account, starting at 2.
+    """
+    taken = {a["desktop"] for a in accounts if "desktop" in a}
+    free = (d for d in range(2, 100) if d not in taken)
+    for account in accounts:
+        if "desktop" not in account:
+            account["desktop"] = next(free)
+    return accounts
+
 
 # --- MAIN FLOW ---
-logging.info("Starting adbalances.py script.")
-notify("🧹 Cleaning old screenshots...")
-
-# 0. Clean up old screenshots
-if os.path.exists(SAVE_DIR):
-    shutil.rmtree(SAVE_DIR)
-    logging.info(f"Cleaned up old screenshots in {SAVE_DIR}")
-os.makedirs(SAVE_DIR, exist_ok=True)
-notify("📂 Screenshot folder reset")
-logging.info(f"Created screenshot directory: {SAVE_DIR}")
-
-# 1. Launch both Firefox windows
-notify("🚀 Launching Firefox billing tabs...")
-launch_firefox(PROFILE_1, URL_1)
-launch_firefox(PROFILE_2, URL_2)
-logging.info("Firefox billing tabs launched.")
-
-# 2. Wait for pages to load
-logging.info("Waiting for pages to load (30 seconds)...")
-time.sleep(60)
-logging.info("Pages loaded.")
-
-# 3. Take full desktop screenshot (desktop 3)
-take_screenshot("1_desktop3_loaded.png")
-logging.info("Desktop 3 screenshot taken.")
-
-# 4. Get visible Firefox windows
-window_ids = get_all_visible_window_ids()
-if len(window_ids) < 2:
-    notify("❌ Less than two Firefox windows found.")
-    logging.error("Less than two Firefox windows found. Exiting.")
-    exit(1)
-logging.info(f"Found {len(window_ids)} Firefox windows.")
-
-# 5. Move the SECOND one to desktop 2
-win_to_move = window_ids[1]
-subprocess.run(["bspc", "node", win_to_move, "-d", "^2"])
-notify("📤 Moved second Firefox window to desktop 2")
-logging.info(f"Moved window {win_to_move} to desktop 2.")
-
-# 6. Work with remaining window on desktop 3
-win_remaining = window_ids[0]
-focus_window(win_remaining)
-press_down(win_remaining)
-take_screenshot("2_desktop3_after_scroll.png")
-logging.info("Processed remaining window on desktop 3.")
-
-# 7. Switch to desktop 2
-subprocess.run(["bspc", "desktop", "-f", "^2"])
-time.sleep(1)
-logging.info("Switched to desktop 2.")
-
-# 8. Focus moved window, scroll, screenshot
-focus_window(win_to_move)
-press_down(win_to_move)
-take_screenshot("3_desktop2_after_scroll.png")
-logging.info("Processed moved window on desktop 2.")
-
-notify("✅ All Firefox screenshots complete.")
-logging.info("adbalances.py script finished successfully.")
+def main():
+    logging.info("Starting adbalances.py script.")
+    accounts = assign_desktops(load_accounts())
+    try:
+        check_profiles(accounts)
+    except ValueError as e:
+        notify(f"❌ {e}", urgent=True)
+        logging.error(str(e))
+        return
+
+    notify("🧹 Cleaning old screenshots...")
+    # 0. Clean up old screenshots
+    if os.path.exists(SAVE_DIR):
+        shutil.rmtree(SAVE_DIR)
+        logging.info(f"Cleaned up old screenshots in {SAVE_DIR}")
+    os.makedirs(SAVE_DIR, exist_ok=True)
+    notify("📂 Screenshot folder reset")
+    logging.info(f"Created screenshot directory: {SAVE_DIR}")
+
+    manifest = []
+    # Pages in a batch load in parallel, so a batch costs one page-load wait
+    # plus a short capture per account.
+    for start in range(0, len(accounts), MAX_CONCURRENT):
+        batch = accounts[start:start + MAX_CONCURRENT]
+
+        # 1. Launch the batch's Firefox windows
+        notify(f"🚀 Launching {len(batch)} Firefox billing tabs...")
+        opened = open_batch(batch)
+
+        # 2. Wait for pages to load
+        logging.info(f"Waiting for pages to load ({PAGE_LOAD_WAIT} seconds)...")
+        time.sleep(PAGE_LOAD_WAIT)
+        logging.info("Pages loaded.")
+
+        # 3. Scroll and screenshot each window on its own desktop
+        for account, win_id in opened:
+            path = capture(account, win_id)
+            close_window(win_id)
+            manifest.append({
+                "name": account["name"],
+                "profile": account["profile"],
+                "screenshot": path,
+                "captured_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            })
+
+    write_manifest(manifest)
+    if len(manifest) < len(accounts):
+        notify(f"⚠️ Captured {len(manifest)} of {len(accounts)} accounts.", urgent=True)
+        logging.warning(f"Captured {len(manifest)} of {len(accounts)} accounts.")
+    else:
+        notify("✅ All Firefox screenshots complete.")
+    logging.info("adbalances.py script finished successfully.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""Parser and history for pasted phone balance reports.
+
+A report looks like::
+
+    *Phone Balances 17/2/25*
+    Mpesa: 12,400 KES
+    Equity - 3,050.50
+    Airtel money: KES 800
+    Limit ...
+
+Balance lines sit between the line containing ``Balances`` and the one
+containing ``Limit``. Each is ``account: amount`` or ``account - amount``
+with an optional currency before or after the amount. A date on the
+``Balances`` line is used as the report date.
+
+Lines that don't parse are collected in ``errors`` with their line
+numbers instead of stopping the parse. Recorded reports go into the
+``balances`` table of the ledger database (one set per date, re-recording
+a date replaces it), which is what the totals and day-over-day deltas are
+computed from.
+
+    python balancereport.py reports/*.txt           # parse and show
+    python balancereport.py --record reports/*.txt  # also store them
+    python balancereport.py --history               # totals and deltas
+"""
+
+import re
+import sys
+import time
+import sqlite3
+import logging
+import argparse
+import datetime
+from dataclasses import dataclass, field
+
+import ledger
+
+SECTION_START_RE = re.compile(r'Balances')
+SECTION_END_RE = re.compile(r'Limit')
+DATE_RE = re.compile(r'\b(\d{1,2}/\d{1,2}/\d{2})\b')
+# Split on the first ':' if there is one, otherwise on the first '-'.
+COLON_RE = re.compile(r'^(?P<account>[^:]+):(?P<rest>.*)$')
+DASH_RE = re.compile(r'^(?P<account>[^-]+?)\s*-(?P<rest>.*)$')
+AMOUNT_RE = re.compile(
+    r'^\s*(?P<pre>[A-Za-z$]{1,4}\.?)?\s*(?P<amount>-?\d[\d,]*(?:\.\d+)?)\s*(?P<post>[A-Za-z$]{1,4}\b)?'
+)
+DATE_FORMAT = "%d/%m/%y"
+DEFAULT_CURRENCY = "KES"
+CURRENCY_ALIASES = {"KSH": "KES", "KSHS": "KES", "SH": "KES", "$": "USD"}
+
+
+@dataclass
+class Balance:
+    account: str
+    amount: float
+    currency: str
+    lineno: int
+
+
+@dataclass
+class BalanceError:
+    source: str
+    lineno: int
+    message: str
+    line: str
+
+    def __str__(self):
+        return f"{self.source}:{self.lineno}: {self.message}: {self.line.strip()!r}"
+
+
+@dataclass
+class BalanceReport:
+    date: str
+    balances: list = field(default_factory=list)
+    source: str = "<paste>"
+
+    def totals(self):
+        """{currency: total}"""
+        totals = {}
+        for balance in self.balances:
+            totals[balance.currency] = totals.get(balance.currency, 0) + balance.amount
+        return totals
+
+
+def _currency(text):
+    if not text:
+        return None
+    text = text.strip(".").upper()
+    return CURRENCY_ALIASES.get(text, text)
+
+
+def parse_line(line):
+    """
+    Balance fields (account, amount, currency) from one line, or raise
+    ValueError saying what is wrong with it.
+    """
+    text = line.replace("*", "").strip()
+    found = COLON_RE.match(text) or DASH_RE.match(text)
+    if not found:
+        raise ValueError("no ':' or '-' between account and amount")
+    account = found.group("account").strip()
+    if not account:
+        raise ValueError("missing account name")
+    amount = AMOUNT_RE.match(found.group("rest"))
+    if not amount:
+        raise ValueError("no amount after the account")
+    currency = _currency(amount.group("pre")) or _currency(amount.group("post")) or DEFAULT_CURRENCY
+    return account, float(amount.group("amount").replace(",", "")), currency
+
+
+def parse(lines, source="<paste>", date=None):
+    """
+    Return (BalanceReport, errors) for one report. ``date`` (dd/mm/yy) is
+    used when the Balances line carries none; otherwise today.
+    """
+    report = BalanceReport(date or datetime.date.today().strftime(DATE_FORMAT), source=source)
+    errors = []
+    insection = False
+    sawsection = False
+    for lineno, raw in enumerate(lines, start=1):
+        line = raw.rstrip("\n")
+        if not insection:
+            if SECTION_START_RE.search(line):
+                insection = sawsection = True
+                headerdate = DATE_RE.search(line)
+                if headerdate:
+                    report.date = headerdate.group(1)
+            continue
+        if SECTION_END_RE.search(line):
+            break
+        if not line.strip():
+            continue
+        try:
+            account, amount, currency = parse_line(line)
+        except ValueError as e:
+            errors.append(BalanceError(source, lineno, str(e), line))
+            continue
+        report.balances.append(Balance(account, amount, currency, lineno))
+    if not sawsection:
+        errors.append(BalanceError(source, 0, "no line containing 'Balances'", ""))
+    return report, errors
+
+
+def parse_text(text, **kwargs):
+    return parse(text.splitlines(), **kwargs)
+
+
+def parse_file(path, **kwargs):
+    with open(path) as f:
+        return parse(f, source=str(path), **kwargs)
+
+
+# --- HISTORY ---
+def _connect():
+    ledger.LEDGER_FILE.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(ledger.LEDGER_FILE)
+    conn.row_factory = sqlite3.Row
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS balances (
+            date TEXT NOT NULL,
+            account TEXT NOT NULL,
+            amount REAL NOT NULL,
+            currency TEXT NOT NULL,
+            recorded_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS balances_date ON balances (date)")
+    return conn
+
+
+def record(report):
+    """Store ``report``, replacing anything recorded for the same date."""
+    date = datetime.datetime.strptime(report.date, DATE_FORMAT).date().isoformat()
+    now = time.time()
+    with _connect() as conn:
+        conn.execute("DELETE FROM balances WHERE date = ?", (date,))
+        conn.executemany(
+            "INSERT INTO balances (date, account, amount, currency, recorded_at) VALUES (?, ?, ?, ?, ?)",
+            [(date, x.account, x.amount, x.currency, now) for x in report.balances],
+        )
+    logging.info(f"Recorded {len(report.balances)} balances for {date}.")
+
+
+def history(limit=None):
+    """[(date, currency, total, delta)] oldest first; delta is None on a currency's first day."""
+    conn = _connect()
+    rows = conn.execute(
+        "SELECT date, currency, SUM(amount) AS total FROM balances GROUP BY date, currency ORDER BY date"
+    ).fetchall()
+    result = []
+    previous = {}
+    for row in rows:
+        last = previous.get(row["currency"])
+        result.append((row["date"], row["currency"], row["total"], None if last is None else row["total"] - last))
+        previous[row["currency"]] = row["total"]
+    return result[-limit:] if limit else result
+
+
+def total_deltas(date):
+    """{currency: (total, delta)} for the report recorded on ``date``."""
+    isodate = datetime.datetime.strptime(date, DATE_FORMAT).date().isoformat()
+    return {currency: (total, delta) for day, currency, total, delta in history() if day == isodate}
+
+
+def account_deltas(date):
+    """{(account, currency): (amount, delta)} against the previous recorded date."""
+    isodate = datetime.datetime.strptime(date, DATE_FORMAT).date().isoformat()
+    conn = _connect()
+    previous = conn.execute("SELECT MAX(date) FROM balances WHERE date < ?", (isodate,)).fetchone()[0]
+    before = {}
+    if previous:
+        for row in conn.execute("SELECT account, currency, amount FROM balances WHERE date = ?", (previous,)):
+            before[(row["account"], row["currency"])] = row["amount"]
+    deltas = {}
+    for row in conn.execute("SELECT account, currency, amount FROM balances WHERE date = ?", (isodate,)):
+        key = (row["account"], row["currency"])
+        deltas[key] = (row["amount"], row["amount"] - before[key] if key in before else None)
+    return deltas
+
+
+def _signed(value):
+    return "new" if value is None else f"{value:+,.2f}"
+
+
+def describe(report, deltas=None):
+    """Lines for the terminal: balances, then totals per currency."""
+    lines = [f"{report.source} {report.date}"]
+    for balance in report.balances:
+        delta = (deltas or {}).get((balance.account, balance.currency))
+        suffix = f"  ({_signed(delta[1])})" if delta else ""
+        lines.append(f"    {balance.account:<20} {balance.amount:>14,.2f} {balance.currency}{suffix}")
+    for currency, total in report.totals().items():
+        lines.append(f"    {'total':<20} {total:>14,.2f} {currency}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse phone balance reports and track them over time.")
+    parser.add_argument("paths", nargs="*", help="report files; '-' reads stdin")
+    parser.add_argument("--record", action="store_true", help="store the parsed reports in the history")
+    parser.add_argument("--date", help="dd/mm/yy for reports whose Balances line has no date")
+    parser.add_argument("--history", nargs="?", const=14, type=int, metavar="DAYS", help="show recorded totals with day-over-day deltas")
+    args = parser.parse_args()
+
+    failed = False
+    for path in args.paths:
+        if path == "-":
+            report, errors = parse(sys.stdin, source="<stdin>", date=args.date)
+        else:
+            report, errors = parse_file(path, date=args.date)
+        for error in errors:
+            print(error, file=sys.stderr)
+        failed = failed or bool(errors)
+        if args.record and report.balances:
+            record(report)
+        print("\n".join(describe(report, account_deltas(report.date) if args.record else None)))
+
+    if args.history:
+        for date, currency, total, delta in history(args.history):
+            print(f"{date}  {total:>14,.2f} {currency}  {_signed(delta)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,5 @@
 import os
-import gspread
 import subprocess
-import json 
 import datetime
 import math 
 from dotenv import load_dotenv
@@ -23,7 +21,9 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-from oauth2client.service_account import ServiceAccountCredentials
+import sheets_outbox
+import ledger
+import incomeparse
 
 oscategoryquestion = [
     {"question": "Business type", "options": ["PENZIHALISI", "OKAGWALAOKUTUUFU", "UH"], "param": "type"},
@@ -66,33 +66,16 @@ def collect_data():
         data_list.append(record)
         print("\nRecord added! Add another or type 'stop'.")
 
-def insert_multiple_rows(sheet, data_list):
+def insert_multiple_rows(keyfile, data_list):
     """
-    Inserts multiple rows of data into the first available empty rows in columns A-h.
+    Queues multiple rows of data for the first available empty rows in columns A-h.
 
-    :param sheet: gspread worksheet object
+    :param keyfile: service account key used to write the sheet
     :param data_list: List of dictionaries containing data to insert
     """
-    # Get all values in columns A-D
-    col_range = sheet.range("A:D")
-    
-    # Find the first empty row in column A-D
-    first_empty_row = 1  # Default to first row
-    for i in range(len(col_range)):  
-        if all(cell.value == '' for cell in col_range[i::4]):  # Check A-D for empty row
-            first_empty_row = (i // 4) + 1
-            break
-
-    # Prepare data for batch update
-    batch_data = []
-    for data_dict in data_list:
-        row_data = [data_dict.get(x, "") for x in data_dict]
-        batch_data.append(row_data)
-        first_empty_row += 1  # Move to the next row for the next dictionary
-
-    # Update the sheet with batch data
-    sheet.update(batch_data, f"A{first_empty_row - len(data_list)}:H{first_empty_row - 1}", value_input_option='USER_ENTERED')
-    print(f"{len(data_list)} rows inserted starting from row {first_empty_row - len(data_list)}")
+    batch_data = [[data_dict.get(x, "") for x in data_dict] for data_dict in data_list]
+    # Queued rather than written here; the outbox flushes it in the background.
+    return sheets_outbox.enqueue(keyfile, batch_data, "A", "H", keycols=("A", "D"))
 
 def rofioptionsget(questions: list, prompt=""):
     """
@@ -138,9 +121,7 @@ def inputhandler(prompt, multiline=False):
 def clipboardread():
     theinput = inputhandler("Please paste the data you copied: ", multiline=True)
     print(theinput)
-    result = subprocess.getoutput(f'echo "{theinput.replace("'","")}" | /home/mehmet/.local/bin/fabric --pattern incomelastweek').strip()
-    result = json.loads(result)
-    return result
+    return incomeparse.extract(theinput)
 
 def promptforquestion(questions: list, checklist: list, prompt="N:"):
     answeredproperly = False
@@ -165,6 +146,89 @@ def promptforquestion(questions: list, checklist: list, prompt="N:"):
             answeredproperly = True
     return answers
 
+def rofimultiselect(lines, prompt):
+    """
+    Indexes of the lines picked in a rofi multi-select list (Shift+Enter
+    marks rows, Enter confirms).
+    """
+    result = subprocess.run(['rofi', '-dmenu', '-multi-select', '-format', 'i', '-p', prompt],
+                            input='\n'.join(lines), capture_output=True, text=True, env={**os.environ, 'DISPLAY': ':0.0'})
+    return [int(x) for x in result.stdout.split() if x.isdigit() and int(x) < len(lines)]
+
+def assignbusinesses(items):
+    """
+    Fill in BUSINESS: known payers from the ledger history, the rest in
+    multi-select rounds (pick rows, then their business). Rows left when
+    the list is dismissed are asked one at a time.
+    """
+    known = ledger.payer_businesses()
+    for item in items:
+        business = known.get(ledger.payer_key(item['PERSON']))
+        if business:
+            item['BUSINESS'] = business
+    unknown = [x for x in items if 'BUSINESS' not in x]
+    print(f"{len(items) - len(unknown)} of {len(items)} rows assigned from payer history")
+
+    while unknown:
+        lines = [f"{x['PERSON']}  {x['AMOUNT']}  {x.get('DATE', '')}" for x in unknown]
+        picked = rofimultiselect(lines, f"{len(unknown)} left, pick rows for one business: ")
+        if not picked:
+            break
+        business = promptforquestion(oscategoryquestion, ["type"], prompt=f"{len(picked)} rows:")["type"][0]
+        payers = {ledger.payer_key(unknown[index]['PERSON']) for index in picked}
+        # Other rows from the same payers in this paste go with them.
+        for item in unknown:
+            if ledger.payer_key(item['PERSON']) in payers:
+                item['BUSINESS'] = business
+        unknown = [x for x in unknown if 'BUSINESS' not in x]
+
+    for item in unknown:
+        item['BUSINESS'] = promptforquestion(oscategoryquestion, ["type"], prompt=f"{item['PERSON']} {item['AMOUNT']}:")["type"][0]
+
+def filldates(items):
+    """
+    Ask for every missing DATE in one editable list, one row per line as
+    'dd/mm/yy | PERSON | AMOUNT'. Lines are matched back to their rows by
+    the 'PERSON | AMOUNT' part, never by position, so deleted, reordered or
+    added lines can't put a date on the wrong row. Lines that match no row
+    are ignored; rows left without a date are listed again.
+    """
+    def rowkey(text):
+        return ' '.join(text.split())
+
+    missing = [x for x in items if "DATE" not in x]
+    while missing:
+        template = '\n'.join(f"dd/mm/yy | {x['PERSON']} | {x['AMOUNT']}" for x in missing)
+        try:
+            result = subprocess.run(['zenity', '--text-info', '--editable', '--title', f'Dates for {len(missing)} rows (dd/mm/yy)',
+                                     '--width', '600', '--height', '400', '--filename=/dev/stdin'],
+                                    input=template, capture_output=True, text=True).stdout
+        except FileNotFoundError:
+            result = ""
+        if not result.strip():
+            # Dialog unavailable or cancelled: ask per row as before.
+            for item in missing:
+                item["DATE"] = inputhandler(f"{item}\nWhat was the date for this dd/mm/yy: ").strip()
+            return
+        # Identical rows (same payer and amount) take their dates in order.
+        byrow = {}
+        for item in missing:
+            byrow.setdefault(rowkey(f"{item['PERSON']} | {item['AMOUNT']}"), []).append(item)
+        for line in result.splitlines():
+            if "|" not in line:
+                continue
+            date, rest = (x.strip() for x in line.split("|", 1))
+            rows = byrow.get(rowkey(rest))
+            if not rows:
+                print(f"Ignoring line that matches no row: {line!r}")
+                continue
+            try:
+                datetime.datetime.strptime(date, "%d/%m/%y")
+            except ValueError:
+                continue
+            rows.pop(0)["DATE"] = date
+        missing = [x for x in items if "DATE" not in x]
+
 def main():
     columns = {
         "DATE": "A",
@@ -182,35 +246,25 @@ def main():
     print(result)
     reformatted = []
 
+    filldates(result)
+    assignbusinesses(result)
+
     for item in result:
         newitem = {}
         print(item)
-        if "DATE" not in item:
-            item["DATE"] = inputhandler(f"{item}\nWhat was the date for this dd/mm/yy: ", multiline=True).strip() 
         dateject = datetime.datetime.strptime(item["DATE"], "%d/%m/%y") # 2 digit yr
         item["DAY"] = dateject.strftime("%A")
         item['MONTH'] = dateject.strftime("%m/").lstrip('0')+f"{dateject.year-2000}"
         item['QUARTER'] = f"Q{math.ceil(dateject.month/3.)}{dateject.year}"
-        item['BUSINESS'] = promptforquestion(oscategoryquestion, ["type"], prompt=f"{item['PERSON']} {item['AMOUNT']}:")["type"][0]
 
         for property in columns:
             newitem[columns[property]] = item[property]
         reformatted.append(newitem)
 
     print(reformatted)
-    # Define the scope
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-
-    # Add credentials to the account
-    creds = ServiceAccountCredentials.from_json_keyfile_name(os.path.join(script_dir, "sheets-credential.json"), scope)
-    # Authorize the clientsheet 
-    client = gspread.authorize(creds)
-    # Get the instance of the Spreadsheet
-    sheet = client.open("BUSINESS MANAGER")
-    # Get the first sheet of the Spreadsheet
-    incomeandspendworksheet = sheet.get_worksheet(0)
-    insert_multiple_rows(incomeandspendworksheet, reformatted)
-    sendnotification("Data inserted successfully.")
+    batch = insert_multiple_rows(os.path.join(script_dir, "sheets-credential.json"), reformatted)
+    ledger.record_income(result, batch=batch)
+    sendnotification("Data queued for the sheet.")
 
 if __name__ == '__main__':
     main()
@@ -3,6 +3,8 @@ import requests
 import os
 from pathlib import Path
 
+import http_client
+
 # --- CONFIGURATION ---
 LIST_URL = "https://n8n.tuongeechat.com/webhook/9a228570-f01c-44a2-aeaa-c537b1861d0e"
 DOWNLOAD_URL_TEMPLATE = "https://n8n.tuongeechat.com/webhook/ce2eebb0-169c-4115-9bf3-663cb5464a28?id={id}"
@@ -24,7 +26,7 @@ def main():
     try:
         # Get the list of items
         print(f"Fetching item list from {LIST_URL}...")
-        list_response = requests.get(LIST_URL)
+        list_response = http_client.get(LIST_URL)
         list_response.raise_for_status()  # Raise an exception for bad status codes
         items = list_response.json()
         print(f"Found {len(items)} items to download.")
@@ -41,7 +43,7 @@ def main():
             file_path = DOWNLOAD_DIR / f"{item_name}" # You might want to adjust the extension
 
             print(f"Downloading {item_name} from {download_url}...")
-            download_response = requests.get(download_url)
+            download_response = http_client.get(download_url, conditional=False)
             download_response.raise_for_status()
 
             with open(file_path, "wb") as f:
@@ -50,7 +52,7 @@ def main():
 
         # Call the final webhook
         print(f"Calling final webhook at {FINAL_URL}...")
-        final_response = requests.get(FINAL_URL)
+        final_response = http_client.trigger(FINAL_URL)
         final_response.raise_for_status()
         print("Final webhook called successfully.")
 
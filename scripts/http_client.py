@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Shared HTTP layer for the scripts that talk to webhooks and APIs.
+
+One pooled ``requests.Session`` per process, connect/read timeouts on every
+call, jittered retries on connection errors and 5xx/429 responses, and an
+on-disk ETag/Last-Modified cache so repeated polling of an unchanged
+resource costs a 304.
+"""
+
+import json
+import time
+import random
+import base64
+import hashlib
+import logging
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CACHE_DIR = Path.home() / ".cache" / "tanzimat" / "http"
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (5, 30)
+# Trigger webhooks answer when their workflow finishes, which can take minutes.
+TRIGGER_TIMEOUT = (5, 600)
+DEFAULT_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_session = None
+
+
+def get_session():
+    """Return the process-wide session, creating it on first use."""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16)
+        _session.mount("https://", adapter)
+        _session.mount("http://", adapter)
+    return _session
+
+
+def _cache_path(url):
+    return CACHE_DIR / f"{hashlib.sha256(url.encode()).hexdigest()}.json"
+
+
+def _load_cached(url):
+    path = _cache_path(url)
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text())
+    except ValueError:
+        return None
+
+
+def _store_cached(url, response):
+    validators = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+    if not any(validators.values()):
+        return
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    entry = dict(validators,
+                 content_type=response.headers.get("Content-Type"),
+                 body=base64.b64encode(response.content).decode("ascii"))
+    _cache_path(url).write_text(json.dumps(entry))
+
+
+def _sleep_before_retry(attempt):
+    # Full jitter: anywhere between 0 and the exponential ceiling.
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    time.sleep(delay)
+
+
+def request(method, url, *, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, **kwargs):
+    """
+    Send a request through the shared session, retrying connection errors,
+    timeouts and retryable statuses. The last response is returned as-is;
+    the last exception is re-raised once retries run out.
+    """
+    session = get_session()
+    for attempt in range(retries + 1):
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == retries:
+                raise
+            logging.warning(f"{method} {url} failed ({e}), retry {attempt + 1}/{retries}")
+            _sleep_before_retry(attempt)
+            continue
+        if response.status_code in RETRY_STATUSES and attempt < retries:
+            logging.warning(f"{method} {url} returned {response.status_code}, retry {attempt + 1}/{retries}")
+            _sleep_before_retry(attempt)
+            continue
+        return response
+
+
+def get(url, *, conditional=True, **kwargs):
+    """
+    GET ``url``. With ``conditional`` the last ETag/Last-Modified is sent and
+    a 304 is answered from the cache; the returned response then has status
+    200, the cached body and ``from_cache`` set to True.
+    """
+    cached = _load_cached(url) if conditional else None
+    headers = dict(kwargs.pop("headers", None) or {})
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    response = request("GET", url, headers=headers, **kwargs)
+    response.from_cache = False
+    if response.status_code == 304 and cached:
+        logging.info(f"GET {url} not modified, using cached body.")
+        response.status_code = 200
+        response._content = base64.b64decode(cached["body"])
+        if cached.get("content_type"):
+            response.headers["Content-Type"] = cached["content_type"]
+        response.from_cache = True
+    elif conditional and response.ok:
+        _store_cached(url, response)
+    return response
+
+
+def get_json(url, **kwargs):
+    """GET ``url``, raise on HTTP errors and return the decoded JSON."""
+    response = get(url, **kwargs)
+    response.raise_for_status()
+    return response.json()
+
+
+def post(url, *, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """POST without retries, since the endpoints are not idempotent."""
+    return request("POST", url, timeout=timeout, retries=0, **kwargs)
+
+
+def trigger(url, *, timeout=TRIGGER_TIMEOUT, **kwargs):
+    """
+    GET a webhook that starts a workflow. Not retried and not cached: a
+    retry after a slow answer would run the workflow again.
+    """
+    return request("GET", url, timeout=timeout, retries=0, **kwargs)
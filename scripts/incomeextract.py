@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""Income record extraction from pasted payment messages.
+
+Replaces the ``fabric --pattern incomelastweek`` shell-out: the model is
+called in-process with a JSON schema, so the answer is always a list of
+records instead of free text that has to be parsed. The pattern's own
+``system.md`` is used as the prompt when it exists.
+
+Large pastes are split into chunks on message boundaries and the chunks
+are sent concurrently. Each chunk's result is cached under
+``~/.cache/tanzimat/incomeextract`` by a hash of the model, prompt and
+text, so pasting the same messages again costs nothing.
+
+Records have PERSON, AMOUNT and TYPE; DATE (dd/mm/yy) is left out when the
+message has none, which is how ``businessmanagerwrite`` knows to ask.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+CACHE_DIR = Path.home() / ".cache" / "tanzimat" / "incomeextract"
+PATTERN_FILE = Path.home() / ".config" / "fabric" / "patterns" / "incomelastweek" / "system.md"
+MODEL = os.environ.get("INCOME_EXTRACT_MODEL", "gpt-4o")
+CHUNK_CHARS = 3000
+MAX_CONCURRENT = 4
+
+FALLBACK_PROMPT = """You extract income records from pasted payment messages (mostly M-Pesa).
+Return one record per payment received, in the order they appear:
+- DATE: the payment date as dd/mm/yy with a two digit year, or null if the message has no date
+- PERSON: the payer's name in capitals as written in the message
+- AMOUNT: the amount received as a number, without currency or commas
+- TYPE: how the money came in, e.g. MPESA, BANK or CASH
+Ignore messages that are not money received."""
+
+SCHEMA = {
+    "name": "income_records",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "additionalProperties": False,
+        "required": ["records"],
+        "properties": {
+            "records": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "additionalProperties": False,
+                    "required": ["DATE", "PERSON", "AMOUNT", "TYPE"],
+                    "properties": {
+                        "DATE": {"type": ["string", "null"]},
+                        "PERSON": {"type": "string"},
+                        "AMOUNT": {"type": "number"},
+                        "TYPE": {"type": "string"},
+                    },
+                },
+            },
+        },
+    },
+}
+
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        from openai import OpenAI
+        _client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    return _client
+
+
+def system_prompt():
+    if PATTERN_FILE.exists():
+        return PATTERN_FILE.read_text()
+    return FALLBACK_PROMPT
+
+
+def split_messages(text):
+    """Blank-line separated blocks when the paste has them, single lines otherwise."""
+    blocks = [x.strip() for x in text.split("\n\n") if x.strip()]
+    if len(blocks) <= 1:
+        blocks = [x.strip() for x in text.splitlines() if x.strip()]
+    return blocks
+
+
+def split_chunks(text, limit=None):
+    """
+    Split ``text`` into chunks of at most ``limit`` characters without
+    cutting a message (see ``split_messages``).
+    """
+    limit = limit or CHUNK_CHARS
+    blocks = split_messages(text)
+    chunks = []
+    current = []
+    size = 0
+    for block in blocks:
+        if current and size + len(block) > limit:
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(block)
+        size += len(block) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _cache_path(prompt, chunk):
+    digest = hashlib.sha256(f"{MODEL}\0{prompt}\0{chunk}".encode()).hexdigest()
+    return CACHE_DIR / f"{digest}.json"
+
+
+def extract_chunk(chunk, prompt):
+    """Records for one chunk, from the cache when it has been seen before."""
+    cache_file = _cache_path(prompt, chunk)
+    if cache_file.exists():
+        logging.info(f"Income extraction cache hit {cache_file.name}")
+        return json.loads(cache_file.read_text())
+
+    response = get_client().chat.completions.create(
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": chunk},
+        ],
+        response_format={"type": "json_schema", "json_schema": SCHEMA},
+        temperature=0,
+    )
+    records = json.loads(response.choices[0].message.content)["records"]
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = cache_file.with_suffix(".tmp")
+    tmp.write_text(json.dumps(records))
+    os.replace(tmp, cache_file)
+    logging.info(f"Extracted {len(records)} income records from {len(chunk)} characters.")
+    return records
+
+
+def _clean(record):
+    record = dict(record)
+    if not record.get("DATE"):
+        record.pop("DATE", None)
+    return record
+
+
+def extract_each(texts):
+    """
+    Income records for each of ``texts`` separately, in paste order within
+    each. The chunks of all the texts share one pool of requests.
+    """
+    prompt = system_prompt()
+    chunks = [(index, chunk) for index, text in enumerate(texts) for chunk in split_chunks(text)]
+    results = [[] for _ in texts]
+    if not chunks:
+        return results
+    with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT, len(chunks))) as pool:
+        extracted = pool.map(lambda item: extract_chunk(item[1], prompt), chunks)
+        for (index, _), records in zip(chunks, extracted):
+            results[index].extend(_clean(record) for record in records)
+    return results
+
+
+def extract(text):
+    """Income records found in ``text``, in paste order."""
+    return extract_each([text])[0]
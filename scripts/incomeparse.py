@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""Local parser for standard M-Pesa income messages.
+
+Most of an income paste is made of messages in a handful of fixed
+formats, e.g.::
+
+    SBK1ABC2DE Confirmed.You have received Ksh1,500.00 from JOHN DOE 0712345678 on 17/2/25 at 10:15 AM New M-PESA balance is ...
+    SBK1ABC2DF Confirmed. Ksh200.00 received from 254712***678 JANE WANJIKU. on 17/2/25 at 9:03 PM ...
+
+The paste is split into one piece per message (blank lines, single lines,
+and the transaction code that starts every M-Pesa message) and every
+regular expression match in a piece becomes a record. Only the text no
+pattern recognises goes to the model through
+``incomeextract.extract_each``, and the share handled locally is reported.
+Each run of consecutive unrecognised messages is extracted on its own so
+the model's records can be put back where those messages were; the result
+keeps the order of the paste.
+
+Run directly with a file (or stdin) to see what would be parsed locally.
+"""
+
+import re
+import sys
+import logging
+import datetime
+
+import incomeextract
+
+MPESA_TYPE = "MPESA"
+AMOUNT = r'Ksh\s?(?P<amount>\d[\d,]*(?:\.\d{1,2})?)'
+PHONE = r'(?:\+?\d[\d*]{6,})'
+DATE = r'(?P<date>\d{1,2}/\d{1,2}/\d{2,4})'
+PATTERNS = [
+    # Send money: "You have received Ksh1,500.00 from JOHN DOE 0712345678 on 17/2/25"
+    re.compile(rf'received\s+{AMOUNT}\s+from\s+(?P<person>.+?)\s*(?:{PHONE}\s*)?\.?\s+on\s+{DATE}', re.IGNORECASE),
+    # Till and paybill: "Ksh200.00 received from 254712***678 JANE WANJIKU. on 17/2/25"
+    re.compile(rf'{AMOUNT}\s+received\s+from\s+(?:{PHONE}\s+)?(?P<person>.+?)\s*(?:{PHONE}\s*)?\.?\s+on\s+{DATE}', re.IGNORECASE),
+]
+# Every M-Pesa message starts with its transaction code, e.g. "SBK1ABC2DE Confirmed".
+MESSAGE_START_RE = re.compile(r'(?=\b[A-Z0-9]{10}\s+[Cc]onfirmed\b)')
+
+
+def _date(text):
+    """'17/2/25' or '17/2/2025' -> '17/02/25'"""
+    for fmt in ("%d/%m/%y", "%d/%m/%Y"):
+        try:
+            return datetime.datetime.strptime(text, fmt).strftime("%d/%m/%y")
+        except ValueError:
+            continue
+    return None
+
+
+def _record(found):
+    date = _date(found.group("date"))
+    person = found.group("person").strip(" .").upper()
+    if not date or not person:
+        return None
+    amount = float(found.group("amount").replace(",", ""))
+    return {"DATE": date, "PERSON": person, "AMOUNT": int(amount) if amount.is_integer() else amount, "TYPE": MPESA_TYPE}
+
+
+def _matches(message):
+    """[(start, end, record)] for every record in ``message``, in order."""
+    matches = []
+    for pattern in PATTERNS:
+        for found in pattern.finditer(message):
+            record = _record(found)
+            if record:
+                matches.append((found.start(), found.end(), record))
+    kept = []
+    end = -1
+    # Two patterns can fit the same text; the earlier match wins.
+    for start, stop, record in sorted(matches, key=lambda x: x[0]):
+        if start >= end:
+            kept.append((start, stop, record))
+            end = stop
+    return kept
+
+
+def parse_records(message):
+    """
+    Every income record in ``message`` in order, or [] when no pattern
+    fits anywhere in it.
+    """
+    return [record for _, _, record in _matches(message)]
+
+
+def _pieces(message):
+    """
+    ``message`` as records and unparsed text in order. Lines no match
+    touches come back as text, so a line without a transaction code that
+    sits under a parsed message still reaches the model.
+    """
+    found = _matches(message)
+    if not found:
+        return [message]
+    items = [(start, record) for start, _, record in found]
+    offset = 0
+    for line in message.splitlines(keepends=True):
+        linestart, offset = offset, offset + len(line)
+        if line.strip() and not any(start < offset and stop > linestart for start, stop, _ in found):
+            items.append((linestart, line.strip()))
+    return [item for _, item in sorted(items, key=lambda x: x[0])]
+
+
+def parse_message(message):
+    """The first income record in ``message``, or None when no pattern fits."""
+    records = parse_records(message)
+    return records[0] if records else None
+
+
+def split_messages(text):
+    """
+    One piece per message: blank-line separated blocks (or lines, see
+    ``incomeextract.split_messages``), further split before each M-Pesa
+    transaction code so a block holding several messages never hides one.
+    """
+    for block in incomeextract.split_messages(text):
+        for piece in MESSAGE_START_RE.split(block):
+            if piece.strip():
+                yield piece.strip()
+
+
+def segments(text):
+    """
+    The paste in order as a list of segments: a parsed record (dict), or a
+    list of consecutive messages no pattern recognised.
+    """
+    result = []
+    for message in split_messages(text):
+        for piece in _pieces(message):
+            if isinstance(piece, dict):
+                result.append(piece)
+            elif result and isinstance(result[-1], list):
+                result[-1].append(piece)
+            else:
+                result.append([piece])
+    return result
+
+
+def parse(text):
+    """(records, leftover messages) for a paste."""
+    records = []
+    leftovers = []
+    for segment in segments(text):
+        if isinstance(segment, dict):
+            records.append(segment)
+        else:
+            leftovers.extend(segment)
+    return records, leftovers
+
+
+def extract(text):
+    """
+    Income records for a paste in paste order: recognised messages parsed
+    here, the rest by the model.
+    """
+    parts = segments(text)
+    runs = [x for x in parts if isinstance(x, list)]
+    parsed = len(parts) - len(runs)
+    leftovers = sum(len(x) for x in runs)
+    total = parsed + leftovers
+    if total:
+        summary = f"{parsed}/{total} messages parsed locally ({parsed / total:.0%}), {leftovers} sent to the model"
+        print(summary)
+        logging.info(summary)
+    extracted = iter(incomeextract.extract_each(["\n\n".join(x) for x in runs]) if runs else [])
+    records = []
+    for segment in parts:
+        if isinstance(segment, dict):
+            records.append(segment)
+        else:
+            records.extend(next(extracted))
+    return records
+
+
+def main(argv):
+    text = open(argv[0]).read() if argv else sys.stdin.read()
+    records, leftovers = parse(text)
+    for record in records:
+        print(record)
+    for message in leftovers:
+        print(f"unrecognised: {message!r}", file=sys.stderr)
+    total = len(records) + len(leftovers)
+    if total:
+        print(f"{len(records)}/{total} parsed locally ({len(records) / total:.0%})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
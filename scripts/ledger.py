@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""Local mirror of the spend and income rows sent to BUSINESS MANAGER.
+
+Every row the scripts queue for the sheet is also recorded in
+``~/.config/scripts/ledger.sqlite`` so questions like "what went on rent
+this month" are answered offline. Rows are keyed by their sheets outbox
+batch: recording a batch again replaces its rows, and the outbox drops
+them with ``forget_batch`` when it gives up on writing the batch. Totals are computed by SQLite with one
+indexed ``GROUP BY`` per breakdown, which keeps a monthly summary in the
+millisecond range for years of data.
+
+    python ledger.py                      # this month
+    python ledger.py summary --month 3/25
+    python ledger.py months               # spend and income per month
+    python ledger.py summary --send BILLS # also queue it for WhatsApp
+
+Months use the sheet's ``m/yy`` format. Run without a terminal (from the
+rofi menu) the output is shown in a zenity window.
+"""
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import logging
+import argparse
+import datetime
+import contextlib
+import subprocess
+from pathlib import Path
+
+LEDGER_FILE = Path.home() / ".config" / "scripts" / "ledger.sqlite"
+SPEND_TYPES = ["DOMESTIC SPEND", "AD SPEND", "BIZ COSTS"]
+DATE_FORMAT = "%d/%m/%y"
+# Currency markers the sheet and the parsers let through, e.g. "Ksh 1,200".
+CURRENCY_RE = re.compile(r'\b(?:kshs?|kes|sh)\.?', re.IGNORECASE)
+
+
+def _connect():
+    LEDGER_FILE.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(LEDGER_FILE)
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS spend (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            month TEXT NOT NULL,
+            amount REAL NOT NULL,
+            type TEXT,
+            tag TEXT,
+            batch INTEGER,
+            recorded_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS spend_month ON spend (month, tag);
+        CREATE TABLE IF NOT EXISTS income (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            month TEXT NOT NULL,
+            person TEXT,
+            amount REAL NOT NULL,
+            type TEXT,
+            business TEXT,
+            batch INTEGER,
+            recorded_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS income_month ON income (month, business);
+    """)
+    return conn
+
+
+def _isodate(date):
+    """'17/2/25' -> '2025-02-17'"""
+    return datetime.datetime.strptime(date, DATE_FORMAT).date().isoformat()
+
+
+def _isomonth(month):
+    """'3/25' -> '2025-03'; ISO months pass through."""
+    if "/" not in month:
+        return month
+    return datetime.datetime.strptime(f"1/{month}", DATE_FORMAT).strftime("%Y-%m")
+
+
+def _sheetmonth(isomonth):
+    """'2025-03' -> '3/25'"""
+    year, month = isomonth.split("-")
+    return f"{int(month)}/{year[2:]}"
+
+
+def _amount(value):
+    """'Ksh 1,200' -> 1200.0; raises ValueError when no number is left."""
+    return float(CURRENCY_RE.sub("", str(value or 0)).replace(",", "").strip() or 0)
+
+
+def record_spend(processeddata, batch=None):
+    """
+    Mirror the rows from ``processthespendingdata``. The ``{"DATE": ...}``
+    spacer rows carry no amount and are skipped, as are rows whose date or
+    amount can't be read (logged). Rows already recorded for ``batch`` are
+    replaced. Returns the number stored.
+    """
+    rows = []
+    now = time.time()
+    for item in processeddata:
+        if "SPEND" not in item:
+            continue
+        try:
+            spendtype = next((x for x in SPEND_TYPES if _amount(item.get(x))), None)
+            date = _isodate(item["DATE"])
+            rows.append((date, date[:7], _amount(item["SPEND"]), spendtype, item.get("TAG") or None, batch, now))
+        except (KeyError, ValueError) as e:
+            logging.warning(f"Not recording spend row {item!r} in the ledger: {e}")
+    with contextlib.closing(_connect()) as conn, conn:
+        if batch is not None:
+            conn.execute("DELETE FROM spend WHERE batch = ?", (batch,))
+        conn.executemany(
+            "INSERT INTO spend (date, month, amount, type, tag, batch, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+    logging.info(f"Recorded {len(rows)} spend rows in the ledger.")
+    return len(rows)
+
+
+def record_income(items, batch=None):
+    """
+    Mirror income records (DATE, PERSON, AMOUNT, TYPE, BUSINESS), skipping
+    and logging unreadable ones. Rows already recorded for ``batch`` are
+    replaced. Returns the number stored.
+    """
+    rows = []
+    now = time.time()
+    for item in items:
+        try:
+            date = _isodate(item["DATE"])
+            rows.append((date, date[:7], item.get("PERSON"), _amount(item["AMOUNT"]), item.get("TYPE"), item.get("BUSINESS"), batch, now))
+        except (KeyError, ValueError) as e:
+            logging.warning(f"Not recording income row {item!r} in the ledger: {e}")
+    with contextlib.closing(_connect()) as conn, conn:
+        if batch is not None:
+            conn.execute("DELETE FROM income WHERE batch = ?", (batch,))
+        conn.executemany(
+            "INSERT INTO income (date, month, person, amount, type, business, batch, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+    logging.info(f"Recorded {len(rows)} income rows in the ledger.")
+    return len(rows)
+
+
+def payer_key(person):
+    return " ".join(str(person or "").upper().split())
+
+
+def payer_businesses(conn=None):
+    """
+    {payer: business} from past income rows: each payer's most frequent
+    business, the most recently used one on a tie.
+    """
+    conn = conn or _connect()
+    rows = conn.execute(
+        "SELECT person, business, COUNT(*) AS n, MAX(recorded_at) AS last FROM income "
+        "WHERE person IS NOT NULL AND business IS NOT NULL GROUP BY person, business"
+    ).fetchall()
+    # The same payer is spelt differently across rows, so tally per payer_key.
+    tally = {}
+    for row in rows:
+        key = (payer_key(row["person"]), row["business"])
+        n, last = tally.get(key, (0, 0))
+        tally[key] = (n + row["n"], max(last, row["last"] or 0))
+    best = {}
+    for (payer, business), score in tally.items():
+        if payer not in best or score > best[payer][0]:
+            best[payer] = (score, business)
+    return {payer: business for payer, (_, business) in best.items()}
+
+
+def month_totals(month, conn=None):
+    """Spend by tag and by type, and income by business, for ``month``."""
+    conn = conn or _connect()
+    month = _isomonth(month)
+    return {
+        "spend_by_tag": conn.execute(
+            "SELECT COALESCE(tag, '-') AS name, SUM(amount) AS total, COUNT(*) AS n FROM spend "
+            "WHERE month = ? GROUP BY tag ORDER BY total DESC", (month,)).fetchall(),
+        "spend_by_type": conn.execute(
+            "SELECT COALESCE(type, '-') AS name, SUM(amount) AS total, COUNT(*) AS n FROM spend "
+            "WHERE month = ? GROUP BY type ORDER BY total DESC", (month,)).fetchall(),
+        "income_by_business": conn.execute(
+            "SELECT COALESCE(business, '-') AS name, SUM(amount) AS total, COUNT(*) AS n FROM income "
+            "WHERE month = ? GROUP BY business ORDER BY total DESC", (month,)).fetchall(),
+    }
+
+
+def monthly_history(conn=None):
+    """[(month, spend, income)] for every month on record, oldest first."""
+    conn = conn or _connect()
+    return conn.execute("""
+        SELECT month, SUM(spend) AS spend, SUM(income) AS income FROM (
+            SELECT month, amount AS spend, 0 AS income FROM spend
+            UNION ALL
+            SELECT month, 0, amount FROM income
+        ) GROUP BY month ORDER BY month
+    """).fetchall()
+
+
+def forget_batch(batch):
+    """Drop the rows of a sheets outbox batch that will never be written."""
+    with contextlib.closing(_connect()) as conn, conn:
+        spend = conn.execute("DELETE FROM spend WHERE batch = ?", (batch,)).rowcount
+        income = conn.execute("DELETE FROM income WHERE batch = ?", (batch,)).rowcount
+    if spend or income:
+        logging.info(f"Dropped {spend} spend and {income} income rows of failed batch {batch} from the ledger.")
+
+
+def month_summary(month):
+    """Plain-text summary of ``month`` for the terminal or WhatsApp."""
+    totals = month_totals(month)
+    spend = sum(x["total"] for x in totals["spend_by_tag"])
+    income = sum(x["total"] for x in totals["income_by_business"])
+    lines = [f"*Ledger {_sheetmonth(_isomonth(month))}*", f"Income: {income:,.0f}", f"Spend: {spend:,.0f}", f"Net: {income - spend:,.0f}"]
+    for title, key in (("Income by business", "income_by_business"), ("Spend by type", "spend_by_type"), ("Spend by category", "spend_by_tag")):
+        if totals[key]:
+            lines.append(f"\n*{title}:*")
+            lines.extend(f"{x['name']}: {x['total']:,.0f}" for x in totals[key])
+    return "\n".join(lines)
+
+
+def show(text, title="Ledger"):
+    """Print ``text``, and open it in zenity when there is no terminal to read it in."""
+    print(text)
+    if sys.stdout.isatty():
+        return
+    try:
+        subprocess.run(['zenity', '--text-info', '--title', title, '--width', '500', '--height', '600', '--filename=/dev/stdin'],
+                       input=text, text=True)
+    except FileNotFoundError:
+        import notifier
+        notifier.Notifier(title).notify(text, urgent=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline totals from the local spend and income ledger.")
+    sub = parser.add_subparsers(dest="command")
+    summary = sub.add_parser("summary", help="income, spend and breakdowns for one month")
+    summary.add_argument("--month", default=datetime.date.today().strftime("%Y-%m"), help="m/yy or yyyy-mm, default this month")
+    summary.add_argument("--send", metavar="CHAT", help="queue the summary for this WhatsApp chat")
+    sub.add_parser("months", help="spend and income per month")
+    args = parser.parse_args()
+    if args.command is None:
+        args = parser.parse_args(["summary"])
+
+    if args.command == "months":
+        show("\n".join(f"{_sheetmonth(row['month']):>6}  spend {row['spend']:>12,.0f}  income {row['income']:>12,.0f}"
+                       for row in monthly_history()), "Ledger by month")
+        return
+
+    text = month_summary(args.month)
+    show(text)
+    if args.send:
+        import whatsapp_outbox
+        whatsapp_outbox.enqueue(args.send, text)
+        whatsapp_outbox.drain()
+
+
+if __name__ == "__main__":
+    LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+    os.makedirs(LOG_DIR, exist_ok=True)
+    logging.basicConfig(
+        filename=os.path.join(LOG_DIR, "ledger.log"),
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    main()
@@ -8,6 +8,9 @@ from pathlib import Path
 from dotenv import load_dotenv
 import logging
 
+import http_client
+import notifier
+
 script_dir = os.path.dirname(os.path.abspath(__file__))
 env_path = os.path.join(script_dir, 'tanzimat.env')
 
@@ -24,8 +27,10 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-def notify(msg):
-    subprocess.run(["notify-send", "[Profile Uploader]", msg])
+_notifier = notifier.Notifier("[Profile Uploader]")
+
+def notify(msg, urgent=False):
+    _notifier.notify(msg, urgent=urgent)
     logging.info(f"Notification: {msg}")
 
 IMAGE_DIR = os.getenv("UNAPLOADED_MEN_DIR")
@@ -104,14 +109,14 @@ def main():
     logging.info("Starting menupload.py script.")
     multiline_text = pick_multiline_text_yad()
     if not multiline_text:
-        notify("No text entered. Exiting.")
+        notify("No text entered. Exiting.", urgent=True)
         logging.warning("No text entered. Exiting.")
         exit()
     notify("Profile text captured.")
 
     image_path = pick_image_from_rofi(IMAGE_DIR)
     if not image_path or not os.path.exists(image_path):
-        notify("No image selected or image not found. Exiting.")
+        notify("No image selected or image not found. Exiting.", urgent=True)
         logging.error(f"No image selected or image not found: {image_path}. Exiting.")
         exit()
     notify(f"Image selected: {os.path.basename(image_path)}")
@@ -120,10 +125,10 @@ def main():
     notify("Sending profile details...")
     form1 = {'details': multiline_text}
     try:
-        response1 = requests.post(UPLOAD_URL1, data=form1)
+        response1 = http_client.post(UPLOAD_URL1, data=form1)
         response1.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
     except requests.exceptions.RequestException as e:
-        notify(f"Failed to post profile details: {e}")
+        notify(f"Failed to post profile details: {e}", urgent=True)
         logging.error(f"Failed to post profile details: {e}")
         exit()
     notify("Profile details sent successfully.")
@@ -158,10 +163,10 @@ def main():
 
     notify("Storing profile data...")
     try:
-        response2 = requests.post(UPLOAD_URL2, data=form2)
+        response2 = http_client.post(UPLOAD_URL2, data=form2)
         response2.raise_for_status()
     except requests.exceptions.RequestException as e:
-        notify(f"Failed to store profile data: {e}")
+        notify(f"Failed to store profile data: {e}", urgent=True)
         logging.error(f"Failed to store profile data: {e}")
         exit()
     print(response2.json())
@@ -182,21 +187,21 @@ def main():
                 'gender': 'Female'
             }
 
-            response = requests.post(UPLOAD_URL3, files=files, data=data)
+            response = http_client.post(UPLOAD_URL3, files=files, data=data)
             response.raise_for_status()
         os.remove(image_path)  # Clean up the image file after upload
         notify("Image uploaded and local file removed.")
         logging.info("Image uploaded and local file removed.")
     except FileNotFoundError:
-        notify(f"Image file not found: {image_path}")
+        notify(f"Image file not found: {image_path}", urgent=True)
         logging.error(f"Image file not found: {image_path}")
         exit()
     except requests.exceptions.RequestException as e:
-        notify(f"Failed to upload image: {e}")
+        notify(f"Failed to upload image: {e}", urgent=True)
         logging.error(f"Failed to upload image: {e}")
         exit()
     except Exception as e:
-        notify(f"An unexpected error occurred during image upload: {e}")
+        notify(f"An unexpected error occurred during image upload: {e}", urgent=True)
         logging.critical(f"An unexpected error occurred during image upload: {e}")
         exit()
 
@@ -209,4 +214,4 @@ if __name__ == '__main__':
         main()
     except Exception as e:
         logging.critical(f"Script failed: {e}")
-        subprocess.run(["notify-send", "Menu Upload Error", f"Script failed: {e}"])
+        notify(f"Script failed: {e}", urgent=True)
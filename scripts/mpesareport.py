@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""Single-pass parser for pasted M-Pesa day reports.
+
+A batch paste looks like::
+
+    *Phone Balances 17/2/25 0+23+39
+    ...balance lines...
+    Expenditure:
+    *Item: NAIVAS 0712345678*
+    Amount: 1,200
+
+    Item: KPLC TOKENS
+    Amount: 500+20
+
+Each ``*Phone`` header starts a day; its second word is the date and its
+last word the other items (``amount+amount+...``). Items under
+``Expenditure`` are separated by blank lines. A day without an
+``Expenditure`` section is skipped. A paste without headers is
+one day whose date and other items are passed in by the caller.
+
+The parser walks the lines once and yields a ``DayReport`` per day. Lines
+it cannot make sense of are recorded in ``errors`` with their line number
+instead of aborting the parse.
+
+Run directly to check files (or stdin) without touching the sheet::
+
+    python mpesareport.py reports/*.txt
+"""
+
+import re
+import sys
+import datetime
+from dataclasses import dataclass, field
+
+HEADER_RE = re.compile(r'^\s*\*Phone\b(.*)$')
+EXPENDITURE_RE = re.compile(r'Expenditure')
+ITEM_RE = re.compile(r'Item:\s*(.*)')
+AMOUNT_RE = re.compile(r'Amount:\s*(.*)')
+DATE_FORMAT = "%d/%m/%y"
+
+
+@dataclass
+class SpendItem:
+    item: str
+    amount: float | None
+    text: str
+    lineno: int
+
+
+@dataclass
+class DayReport:
+    date: str
+    otheritems: float
+    items: list = field(default_factory=list)
+    lineno: int = 0
+    source: str = "<paste>"
+
+
+@dataclass
+class ParseError:
+    source: str
+    lineno: int
+    message: str
+    line: str
+
+    def __str__(self):
+        return f"{self.source}:{self.lineno}: {self.message}: {self.line.strip()!r}"
+
+
+def parse_sum(text):
+    """'1,200+30' -> 1230.0"""
+    return sum(float(x.replace(",", "").strip()) for x in text.strip().split("+"))
+
+
+class ReportParser:
+    def __init__(self):
+        self.errors = []
+
+    def _error(self, source, lineno, message, line):
+        self.errors.append(ParseError(source, lineno, message, line))
+
+    def _check_date(self, date, source, lineno, line):
+        try:
+            datetime.datetime.strptime(date, DATE_FORMAT)
+            return True
+        except (TypeError, ValueError):
+            self._error(source, lineno, f"bad date {date!r}, expected dd/mm/yy", line)
+            return False
+
+    def parse(self, lines, source="<paste>", date=None, otheritems="0"):
+        """
+        Yield a DayReport per day in ``lines``. ``date`` and ``otheritems``
+        are used for expenditure that appears before any ``*Phone`` header.
+        """
+        day = None
+        in_expenditure = False
+        # Days without an Expenditure section are not yielded.
+        seen_expenditure = False
+        # Set after a bad header so its lines don't produce follow-on errors.
+        skipping = False
+        item_lines = []
+        item_start = 0
+
+        def finish_item():
+            if not item_lines:
+                return
+            text = "\n".join(item_lines)
+            name = None
+            amount = None
+            for offset, line in enumerate(item_lines):
+                found = ITEM_RE.search(line)
+                if found and name is None:
+                    name = found.group(1).strip()
+                found = AMOUNT_RE.search(line)
+                if found and amount is None:
+                    try:
+                        amount = parse_sum(found.group(1))
+                    except ValueError:
+                        self._error(source, item_start + offset, "unreadable amount", line)
+            if amount is None and not any(AMOUNT_RE.search(x) for x in item_lines):
+                self._error(source, item_start, "item has no Amount line", item_lines[0])
+            day.items.append(SpendItem(name if name is not None else item_lines[0].strip(), amount, text, item_start))
+            item_lines.clear()
+
+        for lineno, raw in enumerate(lines, start=1):
+            line = raw.rstrip("\n")
+            header = HEADER_RE.match(line)
+            if header:
+                if in_expenditure:
+                    finish_item()
+                if day is not None and seen_expenditure:
+                    yield day
+                in_expenditure = seen_expenditure = False
+                skipping = True
+                tokens = [x.strip("*") for x in header.group(1).split() if x.strip("*")]
+                if len(tokens) < 2:
+                    self._error(source, lineno, "header needs a date and other items", line)
+                    day = None
+                    continue
+                headerdate, headerother = tokens[1], tokens[-1]
+                if not self._check_date(headerdate, source, lineno, line):
+                    day = None
+                    continue
+                try:
+                    other = parse_sum(headerother)
+                except ValueError:
+                    self._error(source, lineno, "unreadable other items", line)
+                    other = 0.0
+                day = DayReport(headerdate, other, lineno=lineno, source=source)
+                skipping = False
+                continue
+
+            if skipping:
+                continue
+            if not in_expenditure:
+                if EXPENDITURE_RE.search(line):
+                    in_expenditure = seen_expenditure = True
+                    if day is None:
+                        if date is None:
+                            self._error(source, lineno, "expenditure before any *Phone header", line)
+                            in_expenditure = False
+                            continue
+                        if not self._check_date(date, source, lineno, line):
+                            in_expenditure = False
+                            continue
+                        try:
+                            other = parse_sum(otheritems or "0")
+                        except ValueError:
+                            self._error(source, lineno, f"unreadable other items {otheritems!r}", line)
+                            other = 0.0
+                        day = DayReport(date, other, lineno=lineno, source=source)
+                continue
+
+            line = line.replace("*", "")
+            if not line.strip():
+                finish_item()
+                continue
+            # A second Item: line without a blank line in between starts a new item.
+            if ITEM_RE.search(line) and any(ITEM_RE.search(x) for x in item_lines):
+                finish_item()
+            if not item_lines:
+                item_start = lineno
+            item_lines.append(line)
+
+        if in_expenditure:
+            finish_item()
+        if day is not None and seen_expenditure:
+            yield day
+
+    def parse_text(self, text, **kwargs):
+        return self.parse(text.splitlines(), **kwargs)
+
+    def parse_file(self, path, **kwargs):
+        with open(path) as f:
+            yield from self.parse(f, source=str(path), **kwargs)
+
+
+def main(argv):
+    parser = ReportParser()
+    paths = argv or ["-"]
+    for path in paths:
+        days = parser.parse(sys.stdin, source="<stdin>") if path == "-" else parser.parse_file(path)
+        for day in days:
+            print(f"{day.source}:{day.lineno}: {day.date} other={day.otheritems:g} items={len(day.items)}")
+            for item in day.items:
+                print(f"    {item.lineno}: {item.item} = {item.amount}")
+    for error in parser.errors:
+        print(error, file=sys.stderr)
+    return 1 if parser.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
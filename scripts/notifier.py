@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Desktop notifications without a ``notify-send`` process per message.
+
+A ``Notifier`` keeps one notification on screen and replaces its text as
+progress messages come in, holding back updates that arrive faster than
+``min_interval``. The D-Bus connection is opened once per process when the
+optional ``jeepney`` package is installed (``pip install jeepney``) and a
+session bus is reachable; otherwise ``notify-send`` is used with a replace
+id so updates still land in the same bubble, at the cost of one process
+per update.
+
+``TANZIMAT_NOTIFY`` selects the mode:
+
+* ``live`` (default): show coalesced updates as they happen.
+* ``batch``: collect everything and show one summary when the script ends.
+* ``quiet``: only show messages sent with ``urgent=True``.
+
+``TANZIMAT_NOTIFY_BACKEND`` forces ``dbus``, ``notify-send`` or ``null``.
+Only ``null`` drops messages; set it to run the scripts headless or in
+tests.
+"""
+
+import os
+import time
+import atexit
+import logging
+import threading
+import subprocess
+
+try:
+    from jeepney import DBusAddress, new_method_call
+    from jeepney.io.blocking import open_dbus_connection
+except ImportError:
+    DBusAddress = None
+
+EXPIRE_TIMEOUT_MS = 5000
+
+
+class NullBackend:
+    def show(self, title, body, replaces_id=0):
+        return replaces_id
+
+
+class NotifySendBackend:
+    def show(self, title, body, replaces_id=0):
+        cmd = ["notify-send", "--print-id", "--expire-time", str(EXPIRE_TIMEOUT_MS)]
+        if replaces_id:
+            cmd += ["--replace-id", str(replaces_id)]
+        result = subprocess.run(cmd + [title, body], capture_output=True, text=True)
+        if result.returncode != 0:
+            # libnotify older than 0.7.9 has no --print-id/--replace-id
+            subprocess.run(["notify-send", title, body])
+            return 0
+        try:
+            return int(result.stdout.strip())
+        except ValueError:
+            return 0
+
+
+class DBusBackend:
+    def __init__(self):
+        self._conn = open_dbus_connection(bus="SESSION")
+        self._address = DBusAddress(
+            "/org/freedesktop/Notifications",
+            bus_name="org.freedesktop.Notifications",
+            interface="org.freedesktop.Notifications",
+        )
+
+    def show(self, title, body, replaces_id=0):
+        msg = new_method_call(
+            self._address, "Notify", "susssasa{sv}i",
+            ("tanzimat", replaces_id, "", title, body, [], {}, EXPIRE_TIMEOUT_MS),
+        )
+        reply = self._conn.send_and_get_reply(msg)
+        return reply.body[0]
+
+
+def _pick_backend():
+    choice = os.getenv("TANZIMAT_NOTIFY_BACKEND", "auto")
+    if choice == "null":
+        return NullBackend()
+    if choice == "notify-send":
+        return NotifySendBackend()
+    if DBusAddress is None:
+        if choice == "dbus":
+            logging.warning("jeepney is not installed, using notify-send.")
+    elif choice == "dbus" or os.getenv("DBUS_SESSION_BUS_ADDRESS"):
+        try:
+            return DBusBackend()
+        except Exception as e:
+            logging.warning(f"D-Bus notifications unavailable ({e}), using notify-send.")
+    return NotifySendBackend()
+
+
+_backend = None
+
+
+def _get_backend():
+    global _backend
+    if _backend is None:
+        _backend = _pick_backend()
+    return _backend
+
+
+class Notifier:
+    def __init__(self, title, mode=None, min_interval=0.75):
+        self.title = title
+        self.mode = mode or os.getenv("TANZIMAT_NOTIFY", "live")
+        self.min_interval = min_interval
+        self._replaces_id = 0
+        self._last_shown = 0.0
+        self._held = None
+        self._timer = None
+        self._batch = []
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def _show(self, body):
+        try:
+            self._replaces_id = _get_backend().show(self.title, body, self._replaces_id)
+        except Exception as e:
+            logging.warning(f"Notification failed: {e}")
+        self._last_shown = time.monotonic()
+        self._held = None
+
+    def _flush_held(self):
+        with self._lock:
+            self._timer = None
+            if self._held:
+                self._show(self._held)
+
+    def notify(self, message, urgent=False):
+        with self._lock:
+            if self.mode == "batch":
+                self._batch.append(message)
+                if urgent:
+                    self._show(message)
+            elif self.mode == "quiet":
+                if urgent:
+                    self._show(message)
+            elif urgent or time.monotonic() - self._last_shown >= self.min_interval:
+                self._show(message)
+            else:
+                # Too soon after the last update: hold it until the interval
+                # is up, letting anything newer replace it in the meantime.
+                self._held = message
+                if self._timer is None:
+                    wait = self.min_interval - (time.monotonic() - self._last_shown)
+                    self._timer = threading.Timer(wait, self._flush_held)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+    def close(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._batch:
+                self._show("\n".join(self._batch))
+                self._batch = []
+            elif self._held:
+                self._show(self._held)
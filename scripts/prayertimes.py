@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Nairobi prayer and zawal times, cached per day.
+
+Two sources feed the daily block: the aladhan API for the prayer times and
+the urdupoint zawal page for zawal. Both are kept in
+``~/.cache/tanzimat/prayertimes.json`` by date, so only the first call of
+the day touches the network. A miss on aladhan fetches the whole month from
+its calendar endpoint, and when both sources are needed they are fetched
+concurrently with short timeouts.
+
+Offline, the most recent cached day is used instead and the result is
+marked ``stale``.
+
+Run directly to print the block, or with ``--prefetch`` to fill the cache
+for the month ahead of time.
+"""
+
+import os
+import re
+import json
+import logging
+import argparse
+import datetime
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import http_client
+
+CACHE_FILE = Path.home() / ".cache" / "tanzimat" / "prayertimes.json"
+ZAWAL_URL = "https://www.urdupoint.com/islam/nairobi-sunrise-zawal-timings.html"
+ALADHAN_PARAMS = "city=Nairobi&country=KE&state=Nairobi&method=4&shafaq=general&tune=5%2C3%2C5%2C7%2C9%2C-1%2C0%2C8%2C-6&timezonestring=UTC&calendarMethod=UAQ"
+CALENDAR_URL = "https://api.aladhan.com/v1/calendarByCity/{year}/{month}?" + ALADHAN_PARAMS
+TIMEOUT = (5, 10)
+RETRIES = 1
+
+TIME_RE = re.compile(r'(\d{1,2}:\d{2})')
+
+
+def _load_cache():
+    if not CACHE_FILE.exists():
+        return {"timings": {}, "zawal": {}}
+    try:
+        return json.loads(CACHE_FILE.read_text())
+    except ValueError:
+        return {"timings": {}, "zawal": {}}
+
+
+def _save_cache(cache):
+    CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = CACHE_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(cache, indent=2, sort_keys=True))
+    os.replace(tmp, CACHE_FILE)
+
+
+def fetch_month(year, month):
+    """{iso date: {prayer: 'HH:MM'}} for a month from the aladhan calendar."""
+    data = http_client.get_json(CALENDAR_URL.format(year=year, month=month), conditional=False, timeout=TIMEOUT, retries=RETRIES)["data"]
+    days = {}
+    for day in data:
+        date = datetime.datetime.strptime(day["date"]["gregorian"]["date"], "%d-%m-%Y").date().isoformat()
+        # Calendar timings carry a zone suffix, e.g. "05:12 (UTC)".
+        days[date] = {name: TIME_RE.search(value).group(1) for name, value in day["timings"].items() if TIME_RE.search(value)}
+    return days
+
+
+def parse_zawal(html):
+    """(start, end) from the zawal page, parsing only the zawal_box table."""
+    from bs4 import BeautifulSoup
+
+    start = html.find("zawal_box")
+    if start == -1:
+        raise ValueError("zawal_box not found on the zawal page")
+    end = html.find("</table>", start)
+    fragment = html[html.rfind("<", 0, start):end + len("</table>") if end != -1 else len(html)]
+    cells = BeautifulSoup(fragment, "html.parser").find("table", {"class": "spec_table"}).find_all("td")
+    starttiming = cells[1].getText().replace("PM", "").strip()
+    endtiming = cells[3].getText().replace("PM", "").strip()
+    return starttiming, endtiming
+
+
+def fetch_zawal():
+    return parse_zawal(http_client.get(ZAWAL_URL, conditional=False, timeout=TIMEOUT, retries=RETRIES).text)
+
+
+def _latest(entries, date):
+    """The newest cached entry on or before ``date`` (or the newest at all)."""
+    earlier = [x for x in entries if x <= date]
+    key = max(earlier) if earlier else max(entries, default=None)
+    return entries[key] if key else None
+
+
+def get_times(date=None):
+    """
+    Prayer and zawal times for ``date`` (default today) as a dict with the
+    aladhan timings, ``zawal`` = (start, end) and ``stale`` set when any
+    part came from an older cached day.
+    """
+    date = date or datetime.date.today()
+    key = date.isoformat()
+    cache = _load_cache()
+    timings = cache["timings"].get(key)
+    zawal = cache["zawal"].get(key)
+
+    if timings is None or zawal is None:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            monthjob = pool.submit(fetch_month, date.year, date.month) if timings is None else None
+            # The zawal page only ever shows today.
+            zawaljob = pool.submit(fetch_zawal) if zawal is None and date == datetime.date.today() else None
+            if monthjob:
+                try:
+                    cache["timings"].update(monthjob.result())
+                    timings = cache["timings"].get(key)
+                except Exception as e:
+                    logging.warning(f"Prayer times fetch failed: {e}")
+            if zawaljob:
+                try:
+                    zawal = cache["zawal"][key] = list(zawaljob.result())
+                except Exception as e:
+                    logging.warning(f"Zawal fetch failed: {e}")
+        _save_cache(cache)
+
+    stale = False
+    if timings is None:
+        timings = _latest(cache["timings"], key)
+        stale = True
+    if zawal is None:
+        zawal = _latest(cache["zawal"], key)
+        stale = True
+    if timings is None or zawal is None:
+        raise RuntimeError("Prayer times unavailable: offline and nothing cached yet")
+    return {**timings, "zawal": tuple(zawal), "stale": stale}
+
+
+def prefetch(date=None):
+    """Fill the cache for the month of ``date`` (default this month)."""
+    date = date or datetime.date.today()
+    cache = _load_cache()
+    cache["timings"].update(fetch_month(date.year, date.month))
+    _save_cache(cache)
+
+
+def format_block(times):
+    """The block pasted into the prayer times chat, one list entry per line."""
+    starttiming, endtiming = times["zawal"]
+    stacklist = ["*Prayer times Nairobi*"]
+    stacklist.append(f"Fajr: {times['Fajr']} Maghrib {times['Maghrib']}")
+    stacklist.append(f"Fajr: {times['Fajr']} Maghrib {times['Maghrib']}")
+    stacklist.append(f"Fajr: {times['Fajr']} Maghrib {times['Maghrib']}\n")
+
+    stacklist.append("*Zawal:*")
+    startishraqtime2 = datetime.datetime.strptime(starttiming, "%H:%M") - datetime.timedelta(minutes=6)
+    stacklist.append(f"{datetime.datetime.strftime(startishraqtime2, '%H:%M')} - {endtiming}")
+    stacklist.append(f"{starttiming} - {endtiming}")
+    stacklist.append('\n')
+
+    stacklist.append("*Ishraq:*")
+    startishraqtime = datetime.datetime.strptime(times['Sunrise'], "%H:%M") + datetime.timedelta(minutes=167)
+    stacklist.append(f"{times['Sunrise']} - {datetime.datetime.strftime(startishraqtime, '%H:%M')}")
+    return stacklist
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print today's Nairobi prayer times.")
+    parser.add_argument("--prefetch", action="store_true", help="cache the whole month's prayer times")
+    args = parser.parse_args()
+    if args.prefetch:
+        prefetch()
+    times = get_times()
+    print('\n'.join(format_block(times)))
+    if times["stale"]:
+        print("(offline: showing the latest cached times)")
+
+
+if __name__ == "__main__":
+    LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+    os.makedirs(LOG_DIR, exist_ok=True)
+    logging.basicConfig(
+        filename=os.path.join(LOG_DIR, "prayertimes.log"),
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    main()
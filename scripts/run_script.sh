@@ -13,14 +13,17 @@ SCRIPT_MAP["Ad Balances"]="adbalances.py"
 SCRIPT_MAP["Business Manager Write"]="businessmanagerwrite.py"
 SCRIPT_MAP["Crop Screenshot"]="crop_screenshot.py"
 SCRIPT_MAP["Flow Creator"]="flow_creator.py"
+SCRIPT_MAP["Flush Sheets Outbox"]="sheets_outbox.py"
 SCRIPT_MAP["Men Upload"]="menupload.py"
 SCRIPT_MAP["Run Flow"]="run_flow.py"
 SCRIPT_MAP["Send Ad Balances"]="sendadbalances.py"
 SCRIPT_MAP["Send Bills Automatically"]="sendsbillsauto.py"
+SCRIPT_MAP["Send WhatsApp Outbox"]="whatsapp_outbox.py"
 SCRIPT_MAP["Show Purgatory"]="show_purgatory.py"
 SCRIPT_MAP["Spend Aggregation"]="spendaggregation.py"
 SCRIPT_MAP["Git Sync"]="git_sync.sh"
 SCRIPT_MAP["Kill Firefox"]="kill_firefox.sh"
+SCRIPT_MAP["Ledger Summary"]="ledger.py"
 SCRIPT_MAP["Reset Timer"]="resettimer.sh"
 SCRIPT_MAP["Start Stop Timer"]="startstoptimer.sh"
 SCRIPT_MAP["Timer"]="timer.sh"
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""Write-ahead outbox for Google Sheets inserts.
+
+``enqueue()`` stores the rows in SQLite and starts a detached flusher, so
+the interactive scripts are done as soon as the rows are on disk; a dead
+network or a throttled API no longer throws away a session's answers.
+
+The flusher writes every due batch for the same worksheet and columns as
+one update. Before writing it records the target row of each batch, so a
+retry after a crash or timeout knows where the rows were meant to go: if
+their key columns are already filled the earlier write landed and the
+batch is marked written, otherwise the same rows are written again at the
+same place. Either way a retry never adds a second copy. Failed batches
+back off exponentially and the flusher sleeps until the next one is due.
+Only one flusher runs at a time.
+
+Run this file directly to flush in the foreground, or with ``--list`` to
+see what is queued.
+"""
+
+import os
+import sys
+import json
+import time
+import fcntl
+import sqlite3
+import logging
+import argparse
+import contextlib
+import subprocess
+from pathlib import Path
+from itertools import groupby
+
+import ledger
+import notifier
+
+OUTBOX_FILE = Path.home() / ".config" / "scripts" / "sheets_outbox.sqlite"
+LOCK_FILE = OUTBOX_FILE.with_suffix(".lock")
+MAX_ATTEMPTS = 10
+BASE_BACKOFF = 30
+MAX_BACKOFF = 3600
+
+_notifier = notifier.Notifier("[Sheets Outbox]")
+
+
+def _connect():
+    OUTBOX_FILE.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(OUTBOX_FILE)
+    conn.row_factory = sqlite3.Row
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS batches (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            keyfile TEXT NOT NULL,
+            spreadsheet TEXT NOT NULL,
+            worksheet INTEGER NOT NULL,
+            firstcol TEXT NOT NULL,
+            lastcol TEXT NOT NULL,
+            firstkeycol TEXT NOT NULL,
+            lastkeycol TEXT NOT NULL,
+            rows TEXT NOT NULL,
+            source TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            target_row INTEGER,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at REAL NOT NULL,
+            written_at REAL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS batches_due ON batches (status, next_attempt_at)")
+    return conn
+
+
+def enqueue(keyfile, rows, firstcol, lastcol, keycols, spreadsheet="BUSINESS MANAGER", worksheet=0, source=None, flush=True):
+    """
+    Queue ``rows`` for the first empty rows of ``keycols`` and return the
+    batch id. Starts the background flusher unless ``flush`` is False.
+    """
+    firstkeycol, lastkeycol = keycols
+    with contextlib.closing(_connect()) as conn, conn:
+        cur = conn.execute(
+            """INSERT INTO batches (keyfile, spreadsheet, worksheet, firstcol, lastcol, firstkeycol, lastkeycol, rows, source, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (os.path.abspath(keyfile), spreadsheet, worksheet, firstcol, lastcol, firstkeycol, lastkeycol,
+             json.dumps(rows), source or Path(sys.argv[0]).name, time.time()),
+        )
+    logging.info(f"Queued {len(rows)} rows for {spreadsheet} {firstcol}:{lastcol} as batch {cur.lastrowid}.")
+    if flush:
+        start_flusher()
+    return cur.lastrowid
+
+
+def start_flusher():
+    """Flush in a detached process that outlives the caller."""
+    subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--background"],
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def pending(conn=None):
+    if conn is None:
+        with contextlib.closing(_connect()) as conn:
+            return pending(conn)
+    return conn.execute("SELECT * FROM batches WHERE status = 'pending' ORDER BY id").fetchall()
+
+
+def batch_status(batch_id, conn=None):
+    """The batch row (status, attempts, last_error, ...) for ``batch_id``, or None."""
+    if conn is None:
+        with contextlib.closing(_connect()) as conn:
+            return batch_status(batch_id, conn)
+    return conn.execute("SELECT * FROM batches WHERE id = ?", (batch_id,)).fetchone()
+
+
+def _target(row):
+    return (row["keyfile"], row["spreadsheet"], row["worksheet"],
+            row["firstcol"], row["lastcol"], row["firstkeycol"], row["lastkeycol"])
+
+
+def _mark_written(conn, batch_ids):
+    conn.executemany("UPDATE batches SET status = 'written', written_at = ? WHERE id = ?",
+                     [(time.time(), x) for x in batch_ids])
+    conn.commit()
+
+
+def _mark_failed(conn, batches, error):
+    for batch in batches:
+        attempts = batch["attempts"] + 1
+        if attempts >= MAX_ATTEMPTS:
+            conn.execute("UPDATE batches SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+                         (attempts, error, batch["id"]))
+            logging.error(f"Giving up on batch {batch['id']} after {attempts} attempts: {error}")
+            _notifier.notify(f"Gave up writing batch {batch['id']} to Sheets: {error}", urgent=True)
+            # Its rows never reach the sheet, so they leave the local mirror too.
+            ledger.forget_batch(batch["id"])
+            continue
+        delay = min(BASE_BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+        conn.execute("UPDATE batches SET attempts = ?, last_error = ?, next_attempt_at = ? WHERE id = ?",
+                     (attempts, error, time.time() + delay, batch["id"]))
+        logging.warning(f"Batch {batch['id']} failed ({error}), retrying in {delay}s.")
+    conn.commit()
+
+
+def _flush_target(conn, target, batches):
+    """Write the due batches of one target. Returns (written, failed) batch counts."""
+    import sheetsclient
+    import sheetswriter
+
+    keyfile, spreadsheet, index, firstcol, lastcol, firstkeycol, lastkeycol = target
+    keycols = (firstkeycol, lastkeycol)
+    reserved = [x for x in batches if x["target_row"] is not None]
+    fresh = [x for x in batches if x["target_row"] is None]
+    current = batches
+    written = 0
+    try:
+        worksheet = sheetsclient.get_worksheet(keyfile, spreadsheet, index)
+
+        # Batches that already had a row picked: finish them in place first.
+        for batch in reserved:
+            current = [batch]
+            rows = json.loads(batch["rows"])
+            if sheetswriter.rows_filled(worksheet, batch["target_row"], len(rows), keycols):
+                logging.info(f"Batch {batch['id']} already landed at row {batch['target_row']}.")
+            else:
+                sheetswriter.write_rows(worksheet, batch["target_row"], rows, firstcol, lastcol)
+            _mark_written(conn, [batch["id"]])
+            written += 1
+
+        if fresh:
+            current = fresh
+            startrow = sheetswriter.find_first_empty_row(worksheet, firstkeycol, lastkeycol)
+            combined = []
+            for batch in fresh:
+                conn.execute("UPDATE batches SET target_row = ? WHERE id = ?", (startrow + len(combined), batch["id"]))
+                combined.extend(json.loads(batch["rows"]))
+            conn.commit()
+            sheetswriter.write_rows(worksheet, startrow, combined, firstcol, lastcol)
+            sheetswriter.remember_next_row(worksheet, keycols, startrow + len(combined))
+            _mark_written(conn, [x["id"] for x in fresh])
+            written += len(fresh)
+            logging.info(f"Wrote {len(fresh)} batches ({len(combined)} rows) to {spreadsheet} from row {startrow}.")
+    except Exception as e:
+        # Later batches for this target wait too, so none of them can take
+        # the rows still reserved by a failed batch.
+        _mark_failed(conn, current, f"{type(e).__name__}: {e}")
+        # The cached ids may be what failed (a renamed or deleted sheet).
+        sheetsclient.forget(keyfile, spreadsheet)
+        return written, len(current)
+    return written, 0
+
+
+def flush_due(conn):
+    """One pass over every due batch. Returns (written, failed)."""
+    due = conn.execute(
+        "SELECT * FROM batches WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY id",
+        (time.time(),),
+    ).fetchall()
+    written = failed = 0
+    for target, batches in groupby(sorted(due, key=_target), key=_target):
+        batches = sorted(batches, key=lambda x: x["id"])
+        # A target that is backing off holds back its newer batches too.
+        waiting = conn.execute(
+            """SELECT 1 FROM batches WHERE status = 'pending' AND next_attempt_at > ?
+               AND keyfile = ? AND spreadsheet = ? AND worksheet = ? AND firstcol = ? AND lastcol = ?
+               AND firstkeycol = ? AND lastkeycol = ? AND id < ?""",
+            (time.time(), *target, batches[-1]["id"]),
+        ).fetchone()
+        if waiting:
+            continue
+        ok, bad = _flush_target(conn, target, batches)
+        written += ok
+        failed += bad
+    return written, failed
+
+
+def flush(wait=True):
+    """
+    Flush until nothing is pending. With ``wait`` the flusher sleeps through
+    backoff delays; without it a single pass is made. Returns (written,
+    failed) or (0, 0) when another flusher holds the lock.
+    """
+    LOCK_FILE.parent.mkdir(parents=True, exist_ok=True)
+    written = failed = 0
+    while True:
+        with open(LOCK_FILE, "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logging.info("Another flusher is already running.")
+                return written, failed
+            with contextlib.closing(_connect()) as conn:
+                while True:
+                    ok, bad = flush_due(conn)
+                    written += ok
+                    failed += bad
+                    # Batches held back behind a failed one come due with it.
+                    nextdue = conn.execute(
+                        "SELECT MIN(next_attempt_at) FROM batches WHERE status = 'pending' AND attempts > 0"
+                    ).fetchone()[0]
+                    if nextdue is None or not wait:
+                        break
+                    time.sleep(max(0, nextdue - time.time()) + 1)
+        # Rows queued while the lock was being released saw a busy flusher
+        # and left; pick them up here.
+        if not wait or not pending():
+            break
+    logging.info(f"Sheets outbox flushed: {written} batches written, {failed} failures.")
+    return written, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write queued rows to Google Sheets.")
+    parser.add_argument("--list", action="store_true", help="show queued batches instead of writing")
+    parser.add_argument("--once", action="store_true", help="make one pass instead of waiting out backoff")
+    parser.add_argument("--background", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.list:
+        for row in pending():
+            rows = json.loads(row["rows"])
+            print(f"{row['id']:>5}  {row['spreadsheet']} {row['firstcol']}:{row['lastcol']}  rows={len(rows)}  "
+                  f"target={row['target_row']}  attempts={row['attempts']}  {row['last_error'] or ''}")
+        return
+    written, failed = flush(wait=not args.once)
+    if not args.background:
+        print(f"{written} batches written, {failed} failures")
+
+
+if __name__ == "__main__":
+    LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+    os.makedirs(LOG_DIR, exist_ok=True)
+    logging.basicConfig(
+        filename=os.path.join(LOG_DIR, "sheets_outbox.log"),
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    main()
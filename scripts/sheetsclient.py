@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Shared Google Sheets access for the spend and income scripts.
+
+Opening "BUSINESS MANAGER" used to cost a token exchange, a Drive search
+by name and two metadata reads on every run. Here:
+
+- the service account access token is kept with its expiry in
+  ``~/.cache/tanzimat/sheets_token.json`` and only refreshed once it has
+  expired, so most runs skip the OAuth round-trip;
+- spreadsheet ids are remembered by name in
+  ``~/.cache/tanzimat/sheets_ids.json`` and opened with ``open_by_key``,
+  which skips the Drive search;
+- worksheet ids and titles are remembered per spreadsheet in
+  ``~/.cache/tanzimat/sheets_worksheets.json`` (``{spreadsheet: {sheet:
+  {sheetId, title, index}}}``), so a known worksheet is built without
+  fetching any metadata at all. ``forget`` drops both caches for a
+  spreadsheet after a failed write;
+- the authorized client (and its HTTP session) and every worksheet handed
+  out are memoized for the life of the process, so repeated writes from
+  one process cost only the writes themselves.
+"""
+
+import os
+import json
+import datetime
+import logging
+from pathlib import Path
+
+import gspread
+from google.oauth2.service_account import Credentials
+from google.auth.transport.requests import Request
+
+CACHE_DIR = Path.home() / ".cache" / "tanzimat"
+TOKEN_FILE = CACHE_DIR / "sheets_token.json"
+IDS_FILE = CACHE_DIR / "sheets_ids.json"
+WORKSHEETS_FILE = CACHE_DIR / "sheets_worksheets.json"
+SCOPES = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+SPREADSHEET = "BUSINESS MANAGER"
+
+_clients = {}
+_spreadsheets = {}
+_worksheets = {}
+
+
+def _read_json(path):
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text())
+    except ValueError:
+        return {}
+
+
+def _write_json(path, data):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, indent=2))
+    os.chmod(tmp, 0o600)
+    os.replace(tmp, path)
+
+
+def _credentials(keyfile):
+    creds = Credentials.from_service_account_file(keyfile, scopes=SCOPES)
+    cached = _read_json(TOKEN_FILE).get(creds.service_account_email)
+    if cached:
+        creds.token = cached["token"]
+        # google-auth compares expiry as naive UTC.
+        creds.expiry = datetime.datetime.fromisoformat(cached["expiry"])
+    if not creds.valid:
+        creds.refresh(Request())
+        tokens = _read_json(TOKEN_FILE)
+        tokens[creds.service_account_email] = {"token": creds.token, "expiry": creds.expiry.isoformat()}
+        _write_json(TOKEN_FILE, tokens)
+        logging.info(f"Refreshed Sheets token for {creds.service_account_email}, valid until {creds.expiry}.")
+    return creds
+
+
+def get_client(keyfile):
+    """Authorized gspread client for the service account in ``keyfile``."""
+    keyfile = os.path.abspath(keyfile)
+    if keyfile not in _clients:
+        _clients[keyfile] = gspread.authorize(_credentials(keyfile))
+    return _clients[keyfile]
+
+
+def open_spreadsheet(keyfile, name=SPREADSHEET):
+    """Open a spreadsheet by name, by id when it has been seen before."""
+    memo = (os.path.abspath(keyfile), name)
+    if memo in _spreadsheets:
+        return _spreadsheets[memo]
+
+    client = get_client(keyfile)
+    ids = _read_json(IDS_FILE)
+    spreadsheet = None
+    if name in ids:
+        try:
+            spreadsheet = client.open_by_key(ids[name])
+        except (gspread.SpreadsheetNotFound, gspread.exceptions.APIError) as e:
+            logging.warning(f"Cached id for {name!r} no longer opens ({e}), searching by name.")
+    if spreadsheet is None:
+        spreadsheet = client.open(name)
+        ids[name] = spreadsheet.id
+        _write_json(IDS_FILE, ids)
+
+    _spreadsheets[memo] = spreadsheet
+    return spreadsheet
+
+
+def get_worksheet(keyfile, name=SPREADSHEET, index=0):
+    """
+    Worksheet ``index`` (a position, or a sheet title) of spreadsheet
+    ``name``, memoized per process and built from the id caches when both
+    are known.
+    """
+    keyfile = os.path.abspath(keyfile)
+    memo = (keyfile, name, index)
+    if memo in _worksheets:
+        return _worksheets[memo]
+
+    spreadsheetid = _read_json(IDS_FILE).get(name)
+    properties = _read_json(WORKSHEETS_FILE).get(name, {}).get(str(index))
+    if spreadsheetid and properties:
+        # Built from cached properties; ranges are addressed by title, so
+        # a renamed sheet fails on write and ``forget`` clears this entry.
+        worksheet = gspread.Worksheet(None, dict(properties), spreadsheetid, get_client(keyfile).http_client)
+    else:
+        spreadsheet = open_spreadsheet(keyfile, name)
+        worksheet = spreadsheet.worksheet(index) if isinstance(index, str) else spreadsheet.get_worksheet(index)
+        worksheets = _read_json(WORKSHEETS_FILE)
+        worksheets.setdefault(name, {})[str(index)] = {"sheetId": worksheet.id, "title": worksheet.title, "index": worksheet.index}
+        _write_json(WORKSHEETS_FILE, worksheets)
+        logging.info(f"Cached worksheet {worksheet.title!r} (gid {worksheet.id}) of {name!r}.")
+
+    _worksheets[memo] = worksheet
+    return worksheet
+
+
+def forget(keyfile, name=SPREADSHEET):
+    """Drop the memoized and cached ids for spreadsheet ``name``."""
+    keyfile = os.path.abspath(keyfile)
+    _spreadsheets.pop((keyfile, name), None)
+    for memo in [x for x in _worksheets if x[:2] == (keyfile, name)]:
+        del _worksheets[memo]
+    for path in (IDS_FILE, WORKSHEETS_FILE):
+        cached = _read_json(path)
+        if cached.pop(name, None) is not None:
+            _write_json(path, cached)
+    logging.info(f"Forgot cached ids for {name!r}.")
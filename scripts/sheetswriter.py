@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Append rows to a worksheet without scanning it every time.
+
+The income (A-H) and spend (J-T) tables sit side by side on the same
+worksheet and have different lengths, which is why the Sheets append API
+cannot be trusted to pick the right row. Instead the row after the last
+write is remembered per worksheet and key columns in
+``~/.cache/tanzimat/sheets_rows.json``. Before reuse it is checked with
+one two-row read: the row above must be filled and the row itself empty.
+Only when that check fails (first run, or rows edited by hand) are the key
+columns downloaded and scanned.
+"""
+
+import json
+import logging
+from pathlib import Path
+
+MARKER_FILE = Path.home() / ".cache" / "tanzimat" / "sheets_rows.json"
+
+
+def _load_markers():
+    if not MARKER_FILE.exists():
+        return {}
+    try:
+        return json.loads(MARKER_FILE.read_text())
+    except ValueError:
+        return {}
+
+
+def _save_marker(key, row):
+    markers = _load_markers()
+    markers[key] = row
+    MARKER_FILE.parent.mkdir(parents=True, exist_ok=True)
+    MARKER_FILE.write_text(json.dumps(markers, indent=2))
+
+
+def _marker_key(worksheet, firstkeycol, lastkeycol):
+    return f"{worksheet.spreadsheet_id}/{worksheet.id}/{firstkeycol}:{lastkeycol}"
+
+
+def _is_empty(values):
+    return all(cell in (None, '') for row in values for cell in row)
+
+
+def _scan_first_empty_row(worksheet, firstkeycol, lastkeycol):
+    # Whole columns: a worksheet built from cached ids has no row count.
+    values = worksheet.get(f"{firstkeycol}:{lastkeycol}")
+    for index, row in enumerate(values, start=1):
+        if _is_empty([row]):
+            return index
+    return len(values) + 1
+
+
+def find_first_empty_row(worksheet, firstkeycol, lastkeycol):
+    """
+    Return the first row whose key columns are empty, using the cached
+    marker when it still holds.
+    """
+    key = _marker_key(worksheet, firstkeycol, lastkeycol)
+    row = _load_markers().get(key)
+    if row:
+        if row == 1:
+            above, at = [["filled"]], worksheet.get(f"{firstkeycol}1:{lastkeycol}1")
+        else:
+            above, at = worksheet.batch_get([
+                f"{firstkeycol}{row - 1}:{lastkeycol}{row - 1}",
+                f"{firstkeycol}{row}:{lastkeycol}{row}",
+            ])
+        if not _is_empty(above) and _is_empty(at):
+            logging.info(f"Cached next row {row} for {key} is still valid.")
+            return row
+        logging.info(f"Cached next row {row} for {key} is stale, rescanning.")
+
+    row = _scan_first_empty_row(worksheet, firstkeycol, lastkeycol)
+    _save_marker(key, row)
+    return row
+
+
+def write_rows(worksheet, startrow, rows, firstcol, lastcol):
+    """Write ``rows`` (lists of cell values) starting at ``startrow``."""
+    worksheet.update(rows, f"{firstcol}{startrow}:{lastcol}{startrow + len(rows) - 1}", value_input_option='USER_ENTERED')
+
+
+def rows_filled(worksheet, startrow, count, keycols):
+    """True when every one of ``count`` rows from ``startrow`` has its key columns filled."""
+    firstkeycol, lastkeycol = keycols
+    values = worksheet.get(f"{firstkeycol}{startrow}:{lastkeycol}{startrow + count - 1}")
+    return len(values) == count and not any(_is_empty([row]) for row in values)
+
+
+def remember_next_row(worksheet, keycols, row):
+    """Record ``row`` as the next free row after a write made elsewhere."""
+    firstkeycol, lastkeycol = keycols
+    _save_marker(_marker_key(worksheet, firstkeycol, lastkeycol), row)
+
+
+def append_rows(worksheet, rows, firstcol, lastcol, keycols):
+    """
+    Write ``rows`` into the first rows whose ``keycols`` (first, last) are
+    empty and return the row the block starts at.
+    """
+    firstkeycol, lastkeycol = keycols
+    startrow = find_first_empty_row(worksheet, firstkeycol, lastkeycol)
+    write_rows(worksheet, startrow, rows, firstcol, lastcol)
+    remember_next_row(worksheet, keycols, startrow + len(rows))
+    print(f"{len(rows)} rows inserted starting from row {startrow}")
+    return startrow
@@ -1,11 +1,9 @@
 import datetime
+import re
+import argparse
 import pyperclip 
-import requests 
-import json 
 import os 
-import gspread
 import subprocess
-import traceback 
 from dotenv import load_dotenv
 import logging
 
@@ -27,35 +25,32 @@ logging.basicConfig(
 
 logging.info("Starting spendaggregation.py script.")
 
-from oauth2client.service_account import ServiceAccountCredentials
-from bs4 import BeautifulSoup
+import whatsapp_outbox
+import prayertimes
+import balancereport
+import sheets_outbox
+import ledger
+from spendmatcher import load_matcher
+from spendstore import SpendStore
+from spendclassifier import SpendClassifier
+from mpesareport import ReportParser, parse_sum
 
 processeddata = []
 
-def getnuancedspendingcategories():
-    if os.path.exists('/home/mehmet/.config/scripts/nuancedspendingcategories.json'):
-        pth = open('/home/mehmet/.config/scripts/nuancedspendingcategories.json', 'r').read()
-        return json.loads(pth)
-    else:
-        categories = ["rent", "electricity", "transaction costs", "groceries", "bills", "other", "social media", "airtime"]
-        with open('/home/mehmet/.config/scripts/nuancedspendingcategories.json', 'w') as f:
-            f.write(json.dumps(categories))
-        return categories
-    
-def getpredefinedspendingmatchers():
-    if os.path.exists('/home/mehmet/.config/scripts/nuancedspendingmatches.json'):
-        pth = open('/home/mehmet/.config/scripts/nuancedspendingmatches.json', 'r').read()
-        return json.loads(pth)
-    else:
-        sample = ["charges", "transfer cost", "transaction cost", "airtime"]
-        matches = [{"type": "BIZ COSTS", "nuancedtype": "transaction costs", "matcher": x} for x in sample]
-        with open('/home/mehmet/.config/scripts/nuancedspendingmatches.json', 'w') as f:
-            f.write(json.dumps(matches))
-        return matches
-
 spendcategories = ["DOMESTIC SPEND", "AD SPEND", "BIZ COSTS"]
-nuancedspendcategories = getnuancedspendingcategories()
-allpredefinedmatches = getpredefinedspendingmatchers()
+UNCATEGORIZEDTAG = "uncategorized"
+# Parts of a spend text that change between payments to the same merchant.
+# Till, paybill, account and phone numbers are left alone.
+VOLATILE_RES = [
+    re.compile(r'\b\d{1,2}/\d{1,2}/\d{2,4}\b'),                        # dates
+    re.compile(r'\b\d{1,2}:\d{2}(?:\s*[ap]m)?\b'),                       # times
+    re.compile(r'\b(?=[a-z\d]*\d)(?=[a-z\d]*[a-z])[a-z\d]{10}\b'),         # M-Pesa transaction codes
+    re.compile(r'(?:ksh|kes)\.?\s*\d[\d,]*(?:\.\d+)?|\b\d{1,3}(?:,\d{3})+(?:\.\d+)?\b|\b\d+\.\d{2}\b'),  # amounts
+]
+spendstore = SpendStore('/home/mehmet/.config/scripts')
+nuancedspendcategories = spendstore.categories
+spendmatcher = load_matcher(spendstore.fingerprint(), spendstore.matches.values())
+spendclassifier = SpendClassifier(spendstore.matches.values())
 oscategoryquestion = [
     {"question": "Type of expenditure", "options": spendcategories, "param": "type"},
     {"question": "More nuanced category for tracking purposes", "options": nuancedspendcategories, "param": "nuancedtype"}
@@ -111,6 +106,12 @@ def getdaydata():
     contents = inputhandler("Enter/Paste your content. Ctrl-D or Ctrl-Z ( windows ) to save it.\nIf in batch make sure to put a * before each phone and add metadata i.e *Phone Balances 17/2/90 0+23+39", multiline=True)
     return contents
 
+def reportparseerrors(parser):
+    for error in parser.errors:
+        print(error)
+    if parser.errors:
+        sendnotification(f"{len(parser.errors)} report lines could not be parsed, see terminal")
+
 def sequentialcollection():
     data = []
     gettingdata = True
@@ -120,29 +121,21 @@ def sequentialcollection():
         daydata = getdaydata()
         if daydata:
             print(daydata)
-            expenditureitems = daydata.split("Expenditure")[1]
             date = inputhandler("Enter the date for the day:")
             otheritems=inputhandler("Enter any other items for the day {date} in the format: amount+amount+amount\nInput: ")
-            data.append({"date":date,"expenditure":expenditureitems,"otheritems":otheritems})
+            parser = ReportParser()
+            data.extend(parser.parse_text(daydata, date=date, otheritems=otheritems))
+            reportparseerrors(parser)
         else:
             gettingdata = False
     return data
 
 def batchcollection():
-    def get_metadata(daydata):
-        firstline = daydata.split("\n")[0]
-        items = [x for x in firstline.split(" ") if x]
-        print(items)
-        otheritems = items[-1]
-        date = items[1]
-        expenditureitems = daydata.split("Expenditure")[1]
-        print(date)
-        print(otheritems)
-        return {"date":date,"expenditure":expenditureitems,"otheritems":otheritems}
-    
-    rawdata = [x for x in getdaydata().replace("Expenditure:", "Expenditure").split("*Phone") if x]
-    print(rawdata)
-    data = [get_metadata(x) for x in rawdata if 'Expenditure' in x if x]
+    parser = ReportParser()
+    data = list(parser.parse_text(getdaydata()))
+    reportparseerrors(parser)
+    for day in data:
+        print(f"{day.date}: {len(day.items)} items, other items {day.otheritems:g}")
     return data
 
 def promptforquestion(questions: list, checklist: list, prompt="N:"):
@@ -171,117 +164,160 @@ def promptforquestion(questions: list, checklist: list, prompt="N:"):
             answeredproperly = True
     return answers
 
-def insert_multiple_rows(sheet, data_list):
+def insert_multiple_rows(keyfile, data_list, flush=True):
     """
-    Inserts multiple rows of data into the first available empty rows where columns K and L are empty,
-    filling data into columns A-H.
+    Queues multiple rows of data for the first available empty rows where columns K and L are empty,
+    filling data into columns J-T.
 
-    :param sheet: gspread worksheet object
+    :param keyfile: service account key used to write the sheet
     :param data_list: List of dictionaries containing data to insert
+    :param flush: start the background flusher (see sheets_outbox.enqueue)
     """
-    # Get all values in columns K and L
-    col_k_l = sheet.range("K1:L" + str(sheet.row_count))  # Fetch K and L values for all rows
-    
-    # Convert to row-wise structure
-    col_k_l_rows = [col_k_l[i:i+2] for i in range(0, len(col_k_l), 2)]  # Group into row pairs
-
-    # Find the first empty row in columns K and L
-    first_empty_row = 1  # Default to first row
-    for idx, row in enumerate(col_k_l_rows, start=1):
-        if all(cell.value in (None, '') for cell in row):  # Check if both K and L are empty
-            first_empty_row = idx
-            break
-
-    # Prepare data for batch update
-    batch_data = []
-    for data_dict in data_list:
-        row_data = [data_dict.get(x, "") for x in data_dict]  # Extract values in order
-        batch_data.append(row_data)
-        first_empty_row += 1  # Move to the next row for the next dictionary
-
-    # Update the sheet with batch data
-    sheet.update(batch_data, f"J{first_empty_row - len(data_list)}:T{first_empty_row - 1}", value_input_option='USER_ENTERED')
-    print(f"{len(data_list)} rows inserted starting from row {first_empty_row - len(data_list)}")
-
-def getamount(expenditureitem):
-    for line in expenditureitem.split("\n"):
-        if 'Amount:' in line:
-            try:
-                theamountstr = line.split(": ")[1].strip().replace(",","")
-                amount = sum([float(x) for x in theamountstr.split("+")])
-                return amount
-            except: 
-                print(expenditureitem)
-                print("Error in getting amount")
-                amount = inputhandler(f"{expenditureitem}\nEnter the amount:")
-                return amount
-
-def processthespendingdata(data):
-    def checkifspendisalreadymatched(item, processeddataitem):
+    batch_data = [[data_dict.get(x, "") for x in data_dict] for data_dict in data_list]
+    # Queued rather than written here; the outbox flushes it in the background.
+    return sheets_outbox.enqueue(keyfile, batch_data, "J", "T", keycols=("K", "L"), flush=flush)
+
+def getamount(spenditem):
+    """
+    The parsed amount, or one typed in when the report line was unreadable.
+    """
+    if spenditem.amount is not None:
+        return spenditem.amount
+    print(spenditem.text)
+    print(f"Error in getting amount (line {spenditem.lineno})")
+    while True:
+        answer = inputhandler(f"{spenditem.text}\nEnter the amount:")
         try:
-            # replaces turkish I with english I
-            spendpartofitem = item.split('\n')[0].replace("İ", "I").split("Item: ")[1].lower().strip()
-
-            for costitem in allpredefinedmatches:
-                if costitem['matcher'] in spendpartofitem and costitem['type'] != '' and costitem['nuancedtype'] != '':
-                    processeddataitem[costitem['type']] = getamount(item)
-                    processeddataitem['TAG'] = costitem['nuancedtype']
-                    return processeddataitem
-            return processeddataitem
-        except:
-            print(traceback.format_exc())
-            return processeddataitem
-
-            
+            return parse_sum(answer or "0")
+        except ValueError:
+            print(f"{answer!r} is not an amount")
+
+def getspendtext(itemname):
+    """
+    The lowercased merchant text of an item, which is what matchers are
+    compared against.
+    """
+    return itemname.replace("İ", "I").lower().strip() # replaces turkish I with english I
+
+def getmerchantkey(spendtext):
+    """
+    Group key for the review pass: amounts, dates, times, transaction codes
+    and punctuation are dropped so repeat payments to a merchant share a key,
+    while till and account numbers keep different merchants apart.
+    """
+    key = spendtext
+    for volatile in VOLATILE_RES:
+        key = volatile.sub(' ', key)
+    key = ' '.join(re.sub(r'[\W_]+', ' ', key).split())
+    return key or spendtext
+
+def applycategory(processdataitem, spendtype, nuancedtype):
+    processdataitem[spendtype] = processdataitem["SPEND"]
+    processdataitem['TAG'] = nuancedtype
+
+def reviewunmatched(unmatched, interactive=True):
+    """
+    Ask once per distinct merchant and apply the answer to all of its
+    occurrences. Every raw spend text gets its own matcher so later imports
+    match without asking. Confident classifier predictions are applied to
+    this import only; they are not saved as matchers or learned from, so a
+    wrong guess never turns into a rule. Without ``interactive`` nothing is
+    asked and merchants the classifier can't place are tagged
+    UNCATEGORIZEDTAG.
+    """
+    leftover = []
+    for position, (key, occurrences) in enumerate(unmatched.items(), start=1):
+        # An answer earlier in this pass may already cover this merchant.
+        costitem = spendmatcher.match(occurrences[0][1])
+        if costitem:
+            for processdataitem, _, _ in occurrences:
+                applycategory(processdataitem, costitem['type'], costitem['nuancedtype'])
+            continue
+
+        predicted = spendclassifier.confident(occurrences[0][1])
+        if predicted:
+            spendtype, nuancedtype = predicted
+            print(f"Auto-categorized '{key}' as {spendtype} / {nuancedtype}")
+            for processdataitem, _, _ in occurrences:
+                applycategory(processdataitem, spendtype, nuancedtype)
+            continue
+        if not interactive:
+            for processdataitem, _, _ in occurrences:
+                processdataitem['TAG'] = UNCATEGORIZEDTAG
+            leftover.append(key)
+            continue
+
+        total = sum(float(processdataitem["SPEND"] or 0) for processdataitem, _, _ in occurrences)
+        prompt = f"[{position}/{len(unmatched)}] {occurrences[0][2].strip()} ({len(occurrences)}x, total {total:g})"
+        rankedtypes, rankednuanced = spendclassifier.rank_options(occurrences[0][1], spendcategories, nuancedspendcategories)
+        questions = [
+            dict(oscategoryquestion[0], options=rankedtypes),
+            dict(oscategoryquestion[1], options=rankednuanced)
+        ]
+        answers = promptforquestion(questions, ["type", "nuancedtype"], prompt=prompt)
+        print(answers)
+        spendtype = answers['type'][0]
+        nuancedtype = answers['nuancedtype'][0]
+
+        for processdataitem, spendtext, _ in occurrences:
+            applycategory(processdataitem, spendtype, nuancedtype)
+            newmatch = {"type": spendtype, "nuancedtype": nuancedtype, "matcher": spendtext}
+            if spendstore.add_match(newmatch):
+                spendmatcher.add(newmatch)
+                spendclassifier.learn(spendtext, spendtype, nuancedtype)
+
+        if nuancedtype.strip() != "quit":
+            spendstore.add_category(nuancedtype)
+
+    if leftover:
+        print(f"{len(leftover)} merchants left as {UNCATEGORIZEDTAG}:")
+        for key in leftover:
+            print(f"    {key}")
+
+def processthespendingdata(data, interactive=True):
+    # Phase 1: auto-match every parsed item, collecting the leftovers by
+    # merchant. Phase 2 (reviewunmatched) asks about each merchant once.
     processeddata = []
+    unmatched = {}
     for day in data:
-        print(day["date"])
-        expenditureitems = day["expenditure"].replace('*', '').split("\n\n")
-        expenditureitems = [x for x in expenditureitems if x]
+        print(day.date)
+        dateject = datetime.datetime.strptime(day.date, "%d/%m/%y")
+        month = f"{dateject.strftime("%m/").lstrip('0')}{dateject.year-2000}"
         
-        for item in expenditureitems:
+        for item in day.items:
             print("The item")
-            print(item)
+            print(item.text)
             processdataitem = dict.fromkeys(spendcategories,0)
-            processdataitem['DATE'] = day["date"]
-            dateject = datetime.datetime.strptime(day["date"], "%d/%m/%y")
-            processdataitem['MONTH'] = f"{dateject.strftime("%m/").lstrip('0')}{dateject.year-2000}"
-            
-            amount = getamount(item)
-            processdataitem["SPEND"] = amount
-            processdataitem = checkifspendisalreadymatched(item, processdataitem)
-                
-            if "TAG" not in processdataitem:
-                answers = promptforquestion(oscategoryquestion, ["type", "nuancedtype"], prompt=item)
-                nuancedanswers = answers['nuancedtype']
-                processdataitem[answers['type'][0]] = amount
-                processdataitem['TAG'] = nuancedanswers[0]
-                print(answers)
-                newmatch = {"type": answers['type'][0], "nuancedtype": nuancedanswers[0], "matcher": item.split('\n')[0].replace("İ", "I").split("Item: ")[1].lower().strip()}
-                
-                if newmatch not in allpredefinedmatches:
-                    allpredefinedmatches.append(newmatch)
-                    with open('/home/mehmet/.config/scripts/nuancedspendingmatches.json', 'w') as f:
-                        f.write(json.dumps(allpredefinedmatches, indent=2))
-
-                if nuancedanswers[0] not in nuancedspendcategories and nuancedanswers[0].strip() != "quit":
-                    nuancedspendcategories.append(nuancedanswers[0])
-                    with open('/home/mehmet/.config/scripts/nuancedspendingcategories.json', 'w') as f:
-                        f.write(json.dumps(nuancedspendcategories))
+            processdataitem['DATE'] = day.date
+            processdataitem['MONTH'] = month
+            if item.amount is None and not interactive:
+                print(f"Skipping {item.item} on {day.date}: no readable amount (line {item.lineno})")
+                continue
+            processdataitem["SPEND"] = getamount(item)
+
+            spendtext = getspendtext(item.item)
+            costitem = spendmatcher.match(spendtext)
+            if costitem:
+                applycategory(processdataitem, costitem['type'], costitem['nuancedtype'])
+            else:
+                unmatched.setdefault(getmerchantkey(spendtext), []).append((processdataitem, spendtext, item.text))
 
             processeddata.append(processdataitem)
-            processeddata.append({"DATE":day["date"]})
+            processeddata.append({"DATE":day.date})
         
         processdataitem = dict.fromkeys(spendcategories, 0)
-        processdataitem['DATE'] = day["date"]
-        dateject = datetime.datetime.strptime(day["date"], "%d/%m/%y")
-        processdataitem['MONTH'] = f"{dateject.strftime("%m/").lstrip('0')}{dateject.year-2000}"
-        processdataitem["BIZ COSTS"] = sum([float(x) for x in day["otheritems"].split("+")]) + processdataitem["BIZ COSTS"]
+        processdataitem['DATE'] = day.date
+        processdataitem['MONTH'] = month
+        processdataitem["BIZ COSTS"] = day.otheritems
         processdataitem["SPEND"] = processdataitem["BIZ COSTS"]
         processdataitem['TAG'] = "transaction costs"
 
         processeddata.append(processdataitem)
-        processeddata.append({"DATE":day["date"]})
+        processeddata.append({"DATE":day.date})
+
+    occurrences = sum(len(x) for x in unmatched.values())
+    print(f"{occurrences} unmatched items from {len(unmatched)} merchants")
+    reviewunmatched(unmatched, interactive=interactive)
     return processeddata
 
 def reformatdata(processeddata, columns):
@@ -295,84 +331,42 @@ def reformatdata(processeddata, columns):
 
 def getbalance():
     balance = inputhandler("Enter the report:", multiline=True)
-    relevantreport = [x for x in balance.split("Limit")[0].split("Balances")[1].split('\n') if x]
-
-    print(relevantreport)
-    total = 0
-    for line in relevantreport:
-        print(line)
-        amountandother = ""
-        if ":" in line:
-            amountandother = line.split(":")[1].strip()
-        else: 
-            amountandother = line.split('-')[1].strip()
-        print(amountandother)
-        amount = amountandother.split(" ")[0].replace(",","")
-        amount = float(amount)
-        total += amount
-    
-    sendnotification(f"Total balance is {total}")
-    print(f"Total balance is {total}")
+    report, errors = balancereport.parse_text(balance)
+    for error in errors:
+        print(error)
+    if errors:
+        sendnotification(f"{len(errors)} balance lines could not be read, see terminal")
+    if not report.balances:
+        return
+
+    balancereport.record(report)
+    print('\n'.join(balancereport.describe(report, balancereport.account_deltas(report.date))))
+    # One total per currency; KES and USD accounts are never added together.
+    changes = balancereport.total_deltas(report.date)
+    parts = []
+    for currency, total in report.totals().items():
+        delta = changes.get(currency, (total, None))[1]
+        parts.append(f"{total:,.0f} {currency}" + (f" ({delta:+,.0f})" if delta is not None else ""))
+    totals = ", ".join(parts)
+    sendnotification(f"Total balance is {totals}")
+    print(f"Total balance is {totals}")
     
 def get_prayer_times():
-    zawalurl = "https://www.urdupoint.com/islam/nairobi-sunrise-zawal-timings.html"
-    url = f"https://api.aladhan.com/v1/timingsByCity/{datetime.datetime.now().strftime('%d-%m-%Y')}?city=Nairobi&country=KE&state=Nairobi&method=4&shafaq=general&tune=5%2C3%2C5%2C7%2C9%2C-1%2C0%2C8%2C-6&timezonestring=UTC&calendarMethod=UAQ"
-    
-    stacklist = []
-    
-    zawalcontent = requests.get(zawalurl).content
-    soup = BeautifulSoup(zawalcontent, "html.parser")
-    
-    zawaldiv = soup.find("div", {"class": "zawal_box"})
-    zawaltable = zawaldiv.find("table", {"class": "spec_table"})
-    zawaltimings = zawaltable.find_all("td")
-    
-    starttiming = zawaltimings[1].getText().replace("PM", "").strip()
-    endtiming = zawaltimings[3].getText().replace("PM", "").strip()
-    
-    document = requests.get(url).content.decode("utf-8")
-    document = json.loads(document)['data']['timings']
-    
-    print("*Prayer times Nairobi*")
-    stacklist.append("*Prayer times Nairobi*")
-    print(f"Fajr: {document['Fajr']} Maghrib {document['Maghrib']}")
-    stacklist.append(f"Fajr: {document['Fajr']} Maghrib {document['Maghrib']}")
-    print(f"Fajr: {document['Fajr']} Maghrib {document['Maghrib']}")
-    stacklist.append(f"Fajr: {document['Fajr']} Maghrib {document['Maghrib']}")
-    print(f"Fajr: {document['Fajr']} Maghrib {document['Maghrib']}\n")
-    stacklist.append(f"Fajr: {document['Fajr']} Maghrib {document['Maghrib']}\n")
-
-    print("*Zawal:*")
-    stacklist.append("*Zawal:*")
-    startishraqtime2 = datetime.datetime.strptime(starttiming, "%H:%M") - datetime.timedelta(minutes=6)
-    print(f"{datetime.datetime.strftime(startishraqtime2, '%H:%M')} - {endtiming}")
-    stacklist.append(f"{datetime.datetime.strftime(startishraqtime2, '%H:%M')} - {endtiming}")
-    print(f"{starttiming} - {endtiming}")
-    stacklist.append(f"{starttiming} - {endtiming}")
-    print("\n")
-    stacklist.append('\n')
-
-    print("*Ishraq:*")
-    stacklist.append("*Ishraq:*")
-    startishraqtime = datetime.datetime.strptime(document['Sunrise'], "%H:%M") + datetime.timedelta(minutes=167)
-    print(f"{document['Sunrise']} - {datetime.datetime.strftime(startishraqtime, '%H:%M')}")
-    stacklist.append(f"{document['Sunrise']} - {datetime.datetime.strftime(startishraqtime, '%H:%M')}")
+    times = prayertimes.get_times()
+    stacklist = prayertimes.format_block(times)
+    print('\n'.join(stacklist))
+    if times["stale"]:
+        print("Offline: using the latest cached prayer times")
 
     pyperclip.copy('\n'.join(stacklist))
     os.system('notify send "Prayer times copied"')
 
-def main():
-    collectiontype = promptforquestion(osdatacollectionquestion, ["type"])["type"][0]
-    if collectiontype == "sequential":
-        data = sequentialcollection()
-    elif collectiontype == "prayer":
-        get_prayer_times()
-    elif collectiontype == "balance":
-        getbalance()
-    else: 
-        data = batchcollection()
-    processeddata = processthespendingdata(data)
-    
+    prayerchat = os.getenv("PRAYER_TIMES_CHAT")
+    if prayerchat:
+        whatsapp_outbox.enqueue(prayerchat, '\n'.join(stacklist))
+        whatsapp_outbox.drain()
+
+def writetosheet(processeddata, flush=True):
     columns = {
         "DATE": "J",
         "SPEND": "K",
@@ -388,19 +382,88 @@ def main():
     }
 
     reformatted = reformatdata(processeddata, columns)
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    # Add credentials to the account
-    creds = ServiceAccountCredentials.from_json_keyfile_name(os.path.join(script_dir, "sheets-449816-4627e45280c5.json"), scope)
-    # Authorize the clientsheet 
-    client = gspread.authorize(creds)
-    # Get the instance of the Spreadsheet
-    sheet = client.open("BUSINESS MANAGER")
-    # Get the first sheet of the Spreadsheet
-    incomeandspendworksheet = sheet.get_worksheet(0)
-
-    insert_multiple_rows(incomeandspendworksheet, reformatted)
+
+    batch = insert_multiple_rows(os.path.join(script_dir, "sheets-449816-4627e45280c5.json"), reformatted, flush=flush)
+    ledger.record_spend(processeddata, batch=batch)
+    return batch
+
+def listreportfiles(paths):
+    """
+    Expand directories into the files inside them, sorted so that
+    date-named exports are read in order.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                filepath = os.path.join(path, name)
+                if os.path.isfile(filepath) and not name.startswith('.'):
+                    yield filepath
+        else:
+            yield path
+
+def importreports(paths, review=False):
+    """
+    Backfill from exported day reports: stream every file through the parser,
+    categorize with the stored matchers and write everything in one sheet
+    update. Only asks about unmatched merchants when ``review`` is set.
+    """
+    parser = ReportParser()
+    days = (day for filepath in listreportfiles(paths) for day in parser.parse_file(filepath))
+    processeddata = processthespendingdata(days, interactive=review)
+    spendstore.close()
+    reportparseerrors(parser)
+
+    if not processeddata:
+        print("Nothing to import.")
+        return
+    # Flushed here rather than in the background so the result can be reported.
+    batch = writetosheet(processeddata, flush=False)
+    daycount = len({x['DATE'] for x in processeddata})
+    print(f"Queued {daycount} days as sheet batch {batch}, writing...")
+    sheets_outbox.flush(wait=False)
+    status = sheets_outbox.batch_status(batch)
+    if status["status"] == "written":
+        message = f"Imported {daycount} days."
+    elif status["status"] == "failed":
+        message = f"Sheet write for {daycount} days failed for good: {status['last_error']}"
+    elif status["last_error"]:
+        message = f"Sheet write for {daycount} days failed ({status['last_error']}), will retry in the background."
+        sheets_outbox.start_flusher()
+    else:
+        # Another flusher holds the lock, or an older batch is backing off.
+        message = f"Queued {daycount} days; they will be written in the background."
+        sheets_outbox.start_flusher()
+    print(message)
+    sendnotification(message)
+
+def main():
+    argparser = argparse.ArgumentParser(description="Aggregate M-Pesa spend into the BUSINESS MANAGER sheet.")
+    argparser.add_argument("--import", dest="importpaths", nargs="+", metavar="PATH",
+                           help="day report files or directories to backfill without prompts")
+    argparser.add_argument("--review", action="store_true",
+                           help="with --import, ask about unmatched merchants instead of tagging them uncategorized")
+    args = argparser.parse_args()
+    if args.importpaths:
+        importreports(args.importpaths, review=args.review)
+        return
+
+    collectiontype = promptforquestion(osdatacollectionquestion, ["type"])["type"][0]
+    if collectiontype == "sequential":
+        data = sequentialcollection()
+    elif collectiontype == "prayer":
+        get_prayer_times()
+        return
+    elif collectiontype == "balance":
+        getbalance()
+        return
+    else: 
+        data = batchcollection()
+    processeddata = processthespendingdata(data)
+    spendstore.close()
+
+    writetosheet(processeddata)
     get_prayer_times()
-    sendnotification("Data inserted successfully.")
+    sendnotification("Data queued for the sheet.")
 
 if __name__ == '__main__':
     main()
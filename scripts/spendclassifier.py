@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Local naive Bayes model for spend categories.
+
+Trained on the stored matcher history: each matcher text is an example and
+its (type, nuancedtype) pair is the label. Features are word unigrams and
+bigrams of the text with digits removed. Everything runs in memory; the
+history is small enough that training takes milliseconds.
+
+The categorization review uses it two ways: predictions above
+``AUTO_ACCEPT`` are applied without asking, and for the rest the rofi
+options are ordered by how likely the model thinks they are. Auto-accepted
+labels are never stored as matchers, so the model only learns from answers
+a person gave.
+"""
+
+import re
+import math
+from collections import Counter, defaultdict
+
+# Posterior a prediction needs before it is applied without a prompt.
+AUTO_ACCEPT = 0.95
+# Don't trust the model until it has seen this many examples overall...
+MIN_EXAMPLES = 30
+# ...and this many examples of the predicted label.
+MIN_LABEL_EXAMPLES = 3
+
+
+def features(text):
+    words = re.sub(r'[\d\W_]+', ' ', text.lower()).split()
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class SpendClassifier:
+    def __init__(self, entries=()):
+        self.label_counts = Counter()
+        self.feature_counts = defaultdict(Counter)
+        self.feature_totals = Counter()
+        self.vocabulary = set()
+        for entry in entries:
+            if entry.get('type') and entry.get('nuancedtype'):
+                self.learn(entry['matcher'], entry['type'], entry['nuancedtype'])
+
+    @property
+    def examples(self):
+        return sum(self.label_counts.values())
+
+    def learn(self, text, spendtype, nuancedtype):
+        label = (spendtype, nuancedtype)
+        self.label_counts[label] += 1
+        for feature in features(text):
+            self.feature_counts[label][feature] += 1
+            self.feature_totals[label] += 1
+            self.vocabulary.add(feature)
+
+    def predict(self, text):
+        """Return [(label, probability)] sorted most likely first."""
+        if not self.label_counts:
+            return []
+        tokens = features(text)
+        vocab = len(self.vocabulary) + 1
+        total = self.examples
+        scores = {}
+        for label, count in self.label_counts.items():
+            score = math.log(count / total)
+            denominator = self.feature_totals[label] + vocab
+            counts = self.feature_counts[label]
+            for token in tokens:
+                score += math.log((counts[token] + 1) / denominator)
+            scores[label] = score
+        top = max(scores.values())
+        weights = {label: math.exp(score - top) for label, score in scores.items()}
+        norm = sum(weights.values())
+        return sorted(((label, w / norm) for label, w in weights.items()), key=lambda x: -x[1])
+
+    def confident(self, text):
+        """Return the predicted label when it is safe to apply unasked, else None."""
+        if self.examples < MIN_EXAMPLES:
+            return None
+        ranked = self.predict(text)
+        if not ranked:
+            return None
+        label, probability = ranked[0]
+        if probability >= AUTO_ACCEPT and self.label_counts[label] >= MIN_LABEL_EXAMPLES:
+            return label
+        return None
+
+    def rank_options(self, text, spendtypes, nuancedtypes):
+        """
+        Return both option lists reordered by marginal probability. Options
+        the model knows nothing about keep their original order at the end.
+        """
+        typeprob = Counter()
+        nuancedprob = Counter()
+        for (spendtype, nuancedtype), probability in self.predict(text):
+            typeprob[spendtype] += probability
+            nuancedprob[nuancedtype] += probability
+        rankedtypes = sorted(spendtypes, key=lambda x: -typeprob[x])
+        rankednuanced = sorted(nuancedtypes, key=lambda x: -nuancedprob[x])
+        return rankedtypes, rankednuanced
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Multi-pattern matcher for spend categorization.
+
+Compiles every matcher string from ``nuancedspendingmatches.json`` into one
+Aho-Corasick automaton, so categorizing an item line costs one pass over
+the line no matter how many matchers there are. When several matchers hit
+the same line the winner is picked by an explicit rule instead of list
+order: highest ``priority`` first (entries without one count as 0), then
+the longest matcher, then the one that appears first in the file.
+
+Compiled automatons are pickled under ``~/.cache/tanzimat`` keyed by the
+hash of the matcher files (see ``SpendStore.fingerprint``), so unchanged
+matchers are never recompiled.
+"""
+
+import pickle
+import logging
+from pathlib import Path
+from collections import deque
+
+CACHE_DIR = Path.home() / ".cache" / "tanzimat"
+CACHE_PREFIX = "spendmatcher-"
+
+
+class SpendMatcher:
+    def __init__(self, matches):
+        self.entries = []
+        # matcher text -> index in entries
+        self._positions = {}
+        self._compiled = False
+        for entry in matches:
+            self.add(entry)
+
+    def add(self, entry):
+        """
+        Add a matcher entry, replacing any entry with the same matcher text
+        the way ``SpendStore`` does. The automaton is rebuilt on the next match.
+        """
+        if entry.get('matcher') and entry.get('type') and entry.get('nuancedtype'):
+            position = self._positions.get(entry['matcher'])
+            if position is None:
+                self._positions[entry['matcher']] = len(self.entries)
+                self.entries.append(entry)
+            else:
+                self.entries[position] = entry
+            self._compiled = False
+
+    def _build(self):
+        goto = [{}]
+        output = [[]]
+        for index, entry in enumerate(self.entries):
+            state = 0
+            for char in entry['matcher']:
+                nxt = goto[state].get(char)
+                if nxt is None:
+                    goto.append({})
+                    output.append([])
+                    nxt = len(goto) - 1
+                    goto[state][char] = nxt
+                state = nxt
+            output[state].append(index)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in goto[state].items():
+                queue.append(nxt)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[nxt] = goto[fallback].get(char, 0)
+                output[nxt] = output[nxt] + output[fail[nxt]]
+
+        self._goto, self._fail, self._output = goto, fail, output
+        self._compiled = True
+        logging.info(f"Compiled spend matcher with {len(self.entries)} patterns and {len(goto)} states.")
+
+    def _rank(self, index):
+        entry = self.entries[index]
+        return (entry.get('priority', 0), len(entry['matcher']), -index)
+
+    def find_all(self, text):
+        """Return the indexes of every entry whose matcher occurs in ``text``."""
+        if not self._compiled:
+            self._build()
+        goto, fail, output = self._goto, self._fail, self._output
+        hits = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                hits.update(output[state])
+        return hits
+
+    def match(self, text):
+        """Return the winning entry for ``text``, or None."""
+        hits = self.find_all(text)
+        if not hits:
+            return None
+        return self.entries[max(hits, key=self._rank)]
+
+    def __getstate__(self):
+        if not self._compiled:
+            self._build()
+        return self.__dict__
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if '_positions' not in state:
+            self._positions = {entry['matcher']: index for index, entry in enumerate(self.entries)}
+
+
+def load_matcher(digest, matches):
+    """
+    Return a compiled matcher for ``matches``, read from the pickle cache
+    when one was compiled for the same source ``digest``.
+    """
+    cache_file = CACHE_DIR / f"{CACHE_PREFIX}{digest}.pickle"
+    if cache_file.exists():
+        try:
+            with cache_file.open('rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable matcher cache {cache_file}: {e}")
+
+    matcher = SpendMatcher(matches)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    for stale in CACHE_DIR.glob(f"{CACHE_PREFIX}*.pickle"):
+        stale.unlink()
+    with cache_file.open('wb') as f:
+        pickle.dump(matcher, f)
+    return matcher
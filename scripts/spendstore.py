@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Spend matchers and categories with append-only writes.
+
+The snapshot files (``nuancedspendingmatches.json`` and
+``nuancedspendingcategories.json``) keep their old format. New answers are
+appended as one JSON line each to ``nuancedspending.journal.jsonl`` instead
+of rewriting the snapshots, and loading replays the journal on top of them.
+Matchers are indexed by their text, so checking for and adding a match is
+O(1); a later answer for the same text replaces the earlier one.
+
+``compact()`` folds the journal back into the snapshots. ``close()`` does
+that once the journal has grown past ``COMPACT_THRESHOLD`` lines, so even a
+long batch session rewrites the snapshots at most once.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+
+CONFIG_DIR = Path.home() / ".config" / "scripts"
+MATCHES_FILE = "nuancedspendingmatches.json"
+CATEGORIES_FILE = "nuancedspendingcategories.json"
+JOURNAL_FILE = "nuancedspending.journal.jsonl"
+COMPACT_THRESHOLD = 200
+
+DEFAULT_CATEGORIES = ["rent", "electricity", "transaction costs", "groceries", "bills", "other", "social media", "airtime"]
+DEFAULT_MATCHERS = ["charges", "transfer cost", "transaction cost", "airtime"]
+
+
+def _write_atomic(path, text):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+class SpendStore:
+    def __init__(self, directory=CONFIG_DIR):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.matches_path = self.directory / MATCHES_FILE
+        self.categories_path = self.directory / CATEGORIES_FILE
+        self.journal_path = self.directory / JOURNAL_FILE
+
+        if not self.categories_path.exists():
+            _write_atomic(self.categories_path, json.dumps(DEFAULT_CATEGORIES))
+        if not self.matches_path.exists():
+            sample = [{"type": "BIZ COSTS", "nuancedtype": "transaction costs", "matcher": x} for x in DEFAULT_MATCHERS]
+            _write_atomic(self.matches_path, json.dumps(sample))
+
+        self.matches = {}
+        for entry in json.loads(self.matches_path.read_text()):
+            self.matches[entry['matcher']] = entry
+        self.categories = json.loads(self.categories_path.read_text())
+        self._category_set = set(self.categories)
+
+        self._journal_lines = 0
+        if self.journal_path.exists():
+            with self.journal_path.open() as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash mid-append.
+                        logging.warning(f"Skipping unreadable journal line in {self.journal_path}")
+                        continue
+                    self._apply(record)
+                    self._journal_lines += 1
+        self._journal = self.journal_path.open('a')
+        if self.journal_path.stat().st_size and not self.journal_path.read_bytes().endswith(b"\n"):
+            # Keep the next record off the truncated line.
+            self._journal.write("\n")
+
+    def _apply(self, record):
+        if record['kind'] == 'match':
+            self.matches[record['entry']['matcher']] = record['entry']
+        elif record['kind'] == 'category' and record['name'] not in self._category_set:
+            self.categories.append(record['name'])
+            self._category_set.add(record['name'])
+
+    def _append(self, record):
+        self._apply(record)
+        self._journal.write(json.dumps(record) + "\n")
+        self._journal.flush()
+        self._journal_lines += 1
+
+    def add_match(self, entry):
+        """Record a matcher entry. Returns False if it is already stored as-is."""
+        if self.matches.get(entry['matcher']) == entry:
+            return False
+        self._append({"kind": "match", "entry": entry})
+        return True
+
+    def add_category(self, name):
+        """Record a nuanced category. Returns False if it already exists."""
+        if name in self._category_set:
+            return False
+        self._append({"kind": "category", "name": name})
+        return True
+
+    def fingerprint(self):
+        """Hash of everything on disk, for caches derived from the matchers."""
+        digest = hashlib.sha256(self.matches_path.read_bytes())
+        if self.journal_path.exists():
+            digest.update(self.journal_path.read_bytes())
+        return digest.hexdigest()
+
+    def compact(self):
+        """Rewrite the snapshots with the journal folded in and empty the journal."""
+        _write_atomic(self.matches_path, json.dumps(list(self.matches.values()), indent=2))
+        _write_atomic(self.categories_path, json.dumps(self.categories))
+        self._journal.close()
+        self._journal = self.journal_path.open('w')
+        self._journal_lines = 0
+        logging.info(f"Compacted spend store: {len(self.matches)} matchers, {len(self.categories)} categories.")
+
+    def close(self):
+        if self._journal_lines >= COMPACT_THRESHOLD:
+            self.compact()
+        self._journal.close()
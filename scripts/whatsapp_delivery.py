@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""Shared WhatsApp Web delivery for the reporting bots.
+
+Remembers where WhatsApp was found last time (window id, tab position and
+the on-screen location of each chat row) and checks those cheaply before
+falling back to OCR. The cache lives in ``~/.cache/tanzimat`` and is
+refreshed whenever the slow path has to run.
+"""
+
+import os
+import io
+import re
+import json
+import glob
+import time
+import shutil
+import logging
+import subprocess
+from pathlib import Path
+
+from PIL import Image, ImageChops, ImageStat
+import pytesseract
+from google.cloud import vision
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+CACHE_DIR = Path.home() / ".cache" / "tanzimat"
+STATE_FILE = CACHE_DIR / "whatsapp_delivery.json"
+TEMPLATE_DIR = CACHE_DIR / "whatsapp_templates"
+SCREEN_PATH = "/tmp/_whatsapp_screen.png"
+
+WHATSAPP_DESKTOP = 3
+WHATSAPP_WINDOW_CLASS = "firefox"
+# The whole window title, e.g. "(3) WhatsApp — Mozilla Firefox", so a page
+# that merely mentions WhatsApp in its title never matches.
+WHATSAPP_TITLE_RE = re.compile(r'^(\(\d+\) )?WhatsApp( [-–—] Mozilla Firefox)?$')
+# Half-size of the box cropped around a chat row for template checks.
+TEMPLATE_HALF_WIDTH = 80
+TEMPLATE_HALF_HEIGHT = 14
+# Mean per-pixel difference (0-255) under which a template counts as a match.
+TEMPLATE_THRESHOLD = 12
+
+
+def _load_state() -> dict:
+    if not STATE_FILE.exists():
+        return {"chats": {}}
+    try:
+        return json.loads(STATE_FILE.read_text())
+    except ValueError:
+        logging.warning(f"Corrupt WhatsApp state file {STATE_FILE}, starting fresh.")
+        return {"chats": {}}
+
+
+def _save_state(state: dict) -> None:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    STATE_FILE.write_text(json.dumps(state, indent=2))
+
+
+# --- SCREEN + OCR ---
+def screenshot(path=SCREEN_PATH):
+    logging.info(f"Taking screenshot to {path}")
+    # scrot renames instead of overwriting, which would leave a stale image
+    if os.path.exists(path):
+        os.remove(path)
+    subprocess.run(["scrot", path])
+    return path
+
+
+def find_text_coordinates(image_path, target_text, service_account_path):
+    """
+    Uses Google Cloud Vision to find the coordinates of a target word in an image.
+
+    Returns a list of dictionaries with 'text' and 'box' (polygon of 4 (x, y) tuples)
+    """
+    logging.info(f"Finding text coordinates for '{target_text}' in {image_path} using Vision API.")
+    client = vision.ImageAnnotatorClient.from_service_account_file(service_account_path)
+
+    with io.open(image_path, 'rb') as image_file:
+        content = image_file.read()
+
+    image = vision.Image(content=content)
+    response = client.document_text_detection(image=image)
+
+    if response.error.message:
+        logging.error(f"Vision API error: {response.error.message}")
+        raise Exception(f'API Error: {response.error.message}')
+
+    results = []
+    for page in response.full_text_annotation.pages:
+        for block in page.blocks:
+            for paragraph in block.paragraphs:
+                for word in paragraph.words:
+                    word_text = ''.join([symbol.text for symbol in word.symbols])
+                    if word_text.lower() == target_text.lower():
+                        vertices = word.bounding_box.vertices
+                        box = [(v.x, v.y) for v in vertices]
+                        results.append({"text": word_text, "box": box})
+    logging.info(f"Found {len(results)} matches for '{target_text}'.")
+    return results
+
+
+def find_text_coords(text, image_path=SCREEN_PATH):
+    logging.info(f"Finding text '{text}' in image {image_path}")
+    # Try pytesseract first
+    try:
+        image = Image.open(image_path)
+        data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+        for i, word in enumerate(data["text"]):
+            if text.lower() in word.lower():
+                x = data["left"][i] + data["width"][i] // 2
+                y = data["top"][i] + data["height"][i] // 2
+                logging.info(f"Found text '{text}' at ({x}, {y}) using Tesseract.")
+                return (x, y)
+    except Exception as e:
+        logging.error(f"Error using Tesseract for OCR: {e}")
+
+    # Fallback to Google Cloud Vision if pytesseract fails
+    service_account_files = glob.glob(os.path.join(SCRIPT_DIR, "pimpting*.json"))
+    if service_account_files:
+        try:
+            vision_results = find_text_coordinates(image_path, text, service_account_files[0])
+            if vision_results:
+                # Assuming we take the first match
+                box = vision_results[0]['box']
+                center_x = sum([pt[0] for pt in box]) // 4
+                center_y = sum([pt[1] for pt in box]) // 4
+                logging.info(f"Found text '{text}' at ({center_x}, {center_y}) using Vision API.")
+                return (center_x, center_y)
+        except Exception as e:
+            logging.error(f"Vision API failed: {e}")
+
+    logging.warning(f"Text '{text}' not found in image {image_path}.")
+    return None
+
+
+def click(x, y):
+    subprocess.run(["xdotool", "mousemove", str(x), str(y), "click", "1"])
+
+
+# --- WINDOW + TAB ---
+def get_window_title(win_id):
+    try:
+        return subprocess.check_output(["xdotool", "getwindowname", str(win_id)], stderr=subprocess.DEVNULL).decode().strip()
+    except subprocess.CalledProcessError:
+        return None
+
+
+def get_active_window():
+    try:
+        return subprocess.check_output(["xdotool", "getactivewindow"]).decode().strip()
+    except subprocess.CalledProcessError as e:
+        logging.error(f"Failed to get active window: {e}")
+        return None
+
+
+def _is_whatsapp(title):
+    return bool(title) and bool(WHATSAPP_TITLE_RE.match(title))
+
+
+def _activate(win_id):
+    subprocess.run(["xdotool", "windowactivate", "--sync", str(win_id)])
+
+
+def _search_whatsapp_windows():
+    """Ids of the browser windows whose title is exactly the WhatsApp tab."""
+    try:
+        out = subprocess.check_output(["xdotool", "search", "--class", WHATSAPP_WINDOW_CLASS], stderr=subprocess.DEVNULL)
+    except subprocess.CalledProcessError:
+        return []
+    return [x for x in out.decode().split() if _is_whatsapp(get_window_title(x))]
+
+
+def _cycle_tabs_until_whatsapp(max_tabs=10):
+    """
+    Walk the tabs of the active window from the first one and return the
+    1-based position of the WhatsApp tab, or None.
+    """
+    logging.info("Cycling tabs until WhatsApp is found.")
+    subprocess.run(["xdotool", "key", "alt+1"])
+    time.sleep(0.5)
+    for position in range(1, max_tabs + 1):
+        if _is_whatsapp(get_window_title(get_active_window())):
+            logging.info(f"Found WhatsApp tab at position {position}.")
+            return position
+        subprocess.run(["xdotool", "key", "ctrl+Tab"])
+        time.sleep(0.5)
+    logging.warning("WhatsApp tab not found after cycling.")
+    return None
+
+
+def _focus_from_cache(state):
+    win_id = state.get("window_id")
+    if not win_id:
+        return False
+    title = get_window_title(win_id)
+    if title is None:
+        logging.info(f"Cached WhatsApp window {win_id} is gone.")
+        return False
+    if _is_whatsapp(title):
+        _activate(win_id)
+        logging.info(f"WhatsApp already showing in cached window {win_id}.")
+        return True
+    tab = state.get("tab")
+    # Firefox only has direct shortcuts for the first eight tabs.
+    if tab and tab <= 8:
+        _activate(win_id)
+        subprocess.run(["xdotool", "key", f"alt+{tab}"])
+        time.sleep(0.3)
+        if _is_whatsapp(get_window_title(win_id)):
+            logging.info(f"Switched cached window {win_id} to WhatsApp tab {tab}.")
+            return True
+    return False
+
+
+def _focus_by_ocr(state):
+    screenshot()
+    coords = find_text_coords("WhatsApp")
+    if coords:
+        click(*coords)
+        time.sleep(0.5)
+        logging.info("Clicked WhatsApp via OCR.")
+        if _is_whatsapp(get_window_title(get_active_window())):
+            state["window_id"] = get_active_window()
+            return True
+
+    logging.warning("WhatsApp text not found, falling back to tab switch.")
+    # Focus window by clicking screen center
+    screen_x = shutil.get_terminal_size().columns * 8 // 2
+    screen_y = 500  # or set dynamically
+    click(screen_x, screen_y)
+    time.sleep(0.5)
+    tab = _cycle_tabs_until_whatsapp()
+    if tab:
+        state["window_id"] = get_active_window()
+        state["tab"] = tab
+        return True
+    return False
+
+
+def focus_whatsapp(state=None):
+    """
+    Bring the WhatsApp tab to the front, trying the cached window and tab
+    first, then a search of the browser windows by exact title (giving up
+    when more than one matches), and OCR plus tab cycling last.
+    """
+    state = state if state is not None else _load_state()
+    if _focus_from_cache(state):
+        return True
+
+    matches = _search_whatsapp_windows()
+    if len(matches) > 1:
+        logging.error(f"{len(matches)} windows look like WhatsApp ({', '.join(matches)}); refusing to guess which one to type into.")
+        return False
+    if matches:
+        win_id = matches[0]
+        _activate(win_id)
+        if state.get("window_id") != win_id:
+            state["window_id"] = win_id
+            # Chat rows were measured against the old window.
+            state["chats"] = {}
+        _save_state(state)
+        logging.info(f"Found WhatsApp window {win_id} by title.")
+        return True
+
+    logging.info("No cached or titled WhatsApp window, using OCR.")
+    state["chats"] = {}
+    found = _focus_by_ocr(state)
+    if found:
+        _save_state(state)
+    return found
+
+
+# --- CHAT ROW ---
+def _template_path(chat):
+    safe = "".join(c if c.isalnum() else "_" for c in chat)
+    return TEMPLATE_DIR / f"{safe}.png"
+
+
+def _crop_box(x, y):
+    return (x - TEMPLATE_HALF_WIDTH, y - TEMPLATE_HALF_HEIGHT, x + TEMPLATE_HALF_WIDTH, y + TEMPLATE_HALF_HEIGHT)
+
+
+def _template_matches(chat, entry, screen):
+    template_file = _template_path(chat)
+    if not template_file.exists():
+        return False
+    template = Image.open(template_file).convert("L")
+    region = screen.crop(_crop_box(entry["x"], entry["y"])).convert("L")
+    if region.size != template.size:
+        return False
+    score = ImageStat.Stat(ImageChops.difference(region, template)).mean[0]
+    logging.info(f"Template score for '{chat}': {score:.1f}")
+    return score <= TEMPLATE_THRESHOLD
+
+
+def open_chat(chat, state=None):
+    """
+    Click the chat row named ``chat``. The row position from the last
+    success is reused when the screen still looks the same there.
+    """
+    state = state if state is not None else _load_state()
+    chats = state.setdefault("chats", {})
+    screen = Image.open(screenshot())
+
+    entry = chats.get(chat)
+    if entry and _template_matches(chat, entry, screen):
+        click(entry["x"], entry["y"])
+        time.sleep(0.6)
+        logging.info(f"Clicked chat '{chat}' from cached position.")
+        return True
+
+    coords = find_text_coords(chat)
+    if not coords:
+        logging.warning(f"Chat '{chat}' not found on screen.")
+        return False
+    TEMPLATE_DIR.mkdir(parents=True, exist_ok=True)
+    screen.crop(_crop_box(*coords)).save(_template_path(chat))
+    chats[chat] = {"x": coords[0], "y": coords[1]}
+    _save_state(state)
+    click(*coords)
+    time.sleep(0.6)
+    logging.info(f"Clicked chat '{chat}' via OCR and cached its position.")
+    return True
+
+
+# --- SENDING ---
+def set_clipboard(text):
+    logging.info("Setting clipboard content.")
+    subprocess.run(['xclip', '-selection', 'clipboard'], input=text.encode('utf-8'), check=True)
+
+
+def paste_clipboard():
+    logging.info("Pasting clipboard content.")
+    subprocess.run(["xdotool", "key", "ctrl+shift+v"], check=True)
+    time.sleep(0.2)
+    subprocess.run(["xdotool", "key", "Return"], check=True)
+
+
+def start_session(desktop=WHATSAPP_DESKTOP):
+    """
+    Switch to the WhatsApp desktop and focus the tab. Returns the cached
+    state to pass to open_chat, or None when WhatsApp could not be found.
+    """
+    state = _load_state()
+    subprocess.run(["bspc", "desktop", "-f", f"^{desktop}"])
+    time.sleep(0.3)
+    if not focus_whatsapp(state):
+        logging.error("WhatsApp tab not found.")
+        return None
+    return state
+
+
+def send_text(text):
+    """
+    Paste ``text`` into the chat that is currently open and send it. Raises
+    CalledProcessError when xclip or xdotool fails.
+    """
+    set_clipboard(text)
+    paste_clipboard()
+
+
+def send(chat, text, desktop=WHATSAPP_DESKTOP):
+    """
+    Deliver ``text`` to ``chat``. Returns False when WhatsApp or the chat
+    could not be located.
+    """
+    state = start_session(desktop)
+    if state is None:
+        return False
+    if not open_chat(chat, state):
+        return False
+    send_text(text)
+    logging.info(f"Message sent to '{chat}'.")
+    return True
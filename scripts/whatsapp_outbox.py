@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Local outbox for WhatsApp messages.
+
+Scripts call ``enqueue(chat, text)`` instead of driving the browser
+themselves. ``drain()`` delivers everything that is due in one UI session:
+WhatsApp is located once and each chat is opened once for all of its
+messages. Failed sends are retried on later drains with exponential
+backoff until ``MAX_ATTEMPTS`` is reached.
+
+Run this file directly to drain the queue, or with ``--list`` to see it.
+"""
+
+import os
+import sys
+import time
+import fcntl
+import contextlib
+import sqlite3
+import logging
+import argparse
+from pathlib import Path
+from itertools import groupby
+
+import whatsapp_delivery
+
+OUTBOX_FILE = Path.home() / ".config" / "scripts" / "whatsapp_outbox.sqlite"
+LOCK_FILE = OUTBOX_FILE.with_suffix(".lock")
+MAX_ATTEMPTS = 5
+BASE_BACKOFF = 60
+MAX_BACKOFF = 3600
+
+
+def _connect():
+    OUTBOX_FILE.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(OUTBOX_FILE)
+    conn.row_factory = sqlite3.Row
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat TEXT NOT NULL,
+            text TEXT NOT NULL,
+            source TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at REAL NOT NULL,
+            sent_at REAL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS messages_due ON messages (status, next_attempt_at)")
+    return conn
+
+
+def enqueue(chat, text, source=None):
+    """Queue ``text`` for ``chat`` and return the message id."""
+    with contextlib.closing(_connect()) as conn, conn:
+        cur = conn.execute(
+            "INSERT INTO messages (chat, text, source, created_at) VALUES (?, ?, ?, ?)",
+            (chat, text, source or Path(sys.argv[0]).name, time.time()),
+        )
+    logging.info(f"Queued message {cur.lastrowid} for '{chat}'.")
+    return cur.lastrowid
+
+
+def pending(conn=None):
+    if conn is None:
+        with contextlib.closing(_connect()) as conn:
+            return pending(conn)
+    return conn.execute(
+        "SELECT * FROM messages WHERE status = 'pending' ORDER BY chat, id"
+    ).fetchall()
+
+
+def _mark_sent(conn, message_id):
+    conn.execute("UPDATE messages SET status = 'sent', sent_at = ? WHERE id = ?", (time.time(), message_id))
+
+
+def _mark_failed(conn, message_id, attempts, error):
+    attempts += 1
+    if attempts >= MAX_ATTEMPTS:
+        conn.execute(
+            "UPDATE messages SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+            (attempts, error, message_id),
+        )
+        logging.error(f"Giving up on message {message_id} after {attempts} attempts: {error}")
+        return
+    delay = min(BASE_BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+    conn.execute(
+        "UPDATE messages SET attempts = ?, last_error = ?, next_attempt_at = ? WHERE id = ?",
+        (attempts, error, time.time() + delay, message_id),
+    )
+    logging.warning(f"Message {message_id} failed ({error}), retrying in {delay}s.")
+
+
+def drain(desktop=whatsapp_delivery.WHATSAPP_DESKTOP):
+    """
+    Deliver every due message, grouped by chat. Returns (sent, failed), or
+    None when another drain holds the lock; only one runs at a time.
+    """
+    LOCK_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(LOCK_FILE, "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logging.info("Another drain is already running.")
+            return None
+
+        with contextlib.closing(_connect()) as conn:
+            return _drain(conn, desktop)
+
+
+def _drain(conn, desktop):
+    """Send what is due on an open outbox connection; see ``drain``."""
+    due = conn.execute(
+        "SELECT * FROM messages WHERE status = 'pending' AND next_attempt_at <= ? ORDER BY chat, id",
+        (time.time(),),
+    ).fetchall()
+    if not due:
+        logging.info("Outbox is empty.")
+        return 0, 0
+
+    sent = failed = 0
+    state = whatsapp_delivery.start_session(desktop)
+    with conn:
+        for chat, group in groupby(due, key=lambda row: row["chat"]):
+            group = list(group)
+            if state is None:
+                error = "WhatsApp tab not found"
+            elif not whatsapp_delivery.open_chat(chat, state):
+                error = f"chat '{chat}' not found"
+            else:
+                error = None
+            if error:
+                for row in group:
+                    _mark_failed(conn, row["id"], row["attempts"], error)
+                failed += len(group)
+                continue
+            for row in group:
+                try:
+                    whatsapp_delivery.send_text(row["text"])
+                    _mark_sent(conn, row["id"])
+                    sent += 1
+                except Exception as e:
+                    _mark_failed(conn, row["id"], row["attempts"], str(e))
+                    failed += 1
+                # Commit per message so a crash only resends the one that was
+                # in flight: delivery is at-least-once, not exactly-once.
+                conn.commit()
+    logging.info(f"Outbox drained: {sent} sent, {failed} failed.")
+    return sent, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deliver queued WhatsApp messages.")
+    parser.add_argument("--list", action="store_true", help="show pending messages instead of sending")
+    args = parser.parse_args()
+
+    if args.list:
+        for row in pending():
+            print(f"{row['id']:>5}  {row['chat']:<15} attempts={row['attempts']}  {row['text'][:60]!r}")
+        return
+    result = drain()
+    if result is None:
+        print("Another drain is already running")
+        return
+    sent, failed = result
+    print(f"{sent} sent, {failed} failed")
+
+
+if __name__ == "__main__":
+    LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs")
+    os.makedirs(LOG_DIR, exist_ok=True)
+    logging.basicConfig(
+        filename=os.path.join(LOG_DIR, "whatsapp_outbox.log"),
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    main()
@@ -5,16 +5,31 @@ Reads channel identifiers from ``channels.txt``. Each day, checks for
 videos uploaded in the last 24 hours and downloads them using ``yt-dlp``
 in 360p. Previously downloaded videos are skipped using a local cache
 file. Channel identifiers may be the channel ID (``UC...``), a legacy
-username, or a handle prefixed with ``@``.
+username, or a handle prefixed with ``@``. Handles are resolved to channel
+IDs once and remembered in ``handle_ids.txt``. Feeds are fetched with
+conditional GETs; the last processed body and its ETag/Last-Modified are
+kept per channel in ``feed_cache/`` and an unchanged feed is not parsed.
+
+Shorts (linked as ``/shorts/`` in the feed) and videos under a minute
+according to yt-dlp's metadata are never downloaded; their IDs go into
+``rejected_videos.txt`` with the reason so they are not checked again.
+
+Downloads use yt-dlp as a library on a small worker pool. Partial files
+are resumed (yt-dlp's default), and ``YT_WATCHLIST_RATELIMIT`` (e.g. ``2M``, bytes per
+second) caps the total bandwidth shared by the workers.
 """
 
 import datetime as _dt
+import json
 import re as _re
 import subprocess as _sp
 import xml.etree.ElementTree as _ET
 from pathlib import Path
 from urllib.request import urlopen, Request
 from urllib.error import HTTPError
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
 import sys
 import logging
 from dotenv import load_dotenv
@@ -22,9 +37,17 @@ from dotenv import load_dotenv
 SCRIPT_DIR = Path(__file__).resolve().parent
 CHANNELS_FILE = SCRIPT_DIR / "channels.txt"
 CACHE_FILE = SCRIPT_DIR / "downloaded_videos.txt"
+REJECTED_FILE = SCRIPT_DIR / "rejected_videos.txt"
+HANDLE_IDS_FILE = SCRIPT_DIR / "handle_ids.txt"
+FEED_CACHE_DIR = SCRIPT_DIR / "feed_cache"
 DOWNLOAD_DIR = Path.home() / "yt-watchlist"
 LOG_FILE = SCRIPT_DIR / "youtube_watchlist.log"
 TANZIMAT_ENV_FILE = SCRIPT_DIR / "tanzimat.env"
+FEED_TIMEOUT = 15  # seconds per request
+MAX_FEED_WORKERS = 16
+MIN_DURATION = 60  # seconds; shorter videos are not downloaded
+PROBE_TIMEOUT = 30  # seconds for ffprobe
+MAX_DOWNLOAD_WORKERS = 3
 
 # Configure logging
 logging.basicConfig(
@@ -71,13 +94,64 @@ def _append_cache(path: Path, video_id: str) -> None:
         f.write(video_id + "\n")
 
 
+def _load_rejected(path: Path) -> dict[str, str]:
+    """Video IDs rejected before download, with the reason."""
+    if not path.exists():
+        return {}
+    rejected = {}
+    with path.open() as f:
+        for ln in f:
+            vid, _, reason = ln.rstrip("\n").partition("\t")
+            if vid:
+                rejected[vid] = reason
+    logging.info(f"Loaded {len(rejected)} rejected video IDs.")
+    return rejected
+
+
+def _reject(path: Path, video_id: str, reason: str) -> None:
+    logging.info(f"Rejecting video {video_id}: {reason}")
+    with path.open("a") as f:
+        f.write(f"{video_id}\t{reason}\n")
+
+
+_handle_ids: dict[str, str] | None = None
+_handle_ids_lock = threading.Lock()
+
+
+def _cached_handle_id(handle: str) -> str | None:
+    """Channel ID stored for ``handle`` in the handle_ids.txt cache, if any."""
+    global _handle_ids
+    with _handle_ids_lock:
+        if _handle_ids is None:
+            _handle_ids = {}
+            if HANDLE_IDS_FILE.exists():
+                with HANDLE_IDS_FILE.open() as f:
+                    for ln in f:
+                        parts = ln.split()
+                        if len(parts) == 2:
+                            _handle_ids[parts[0]] = parts[1]
+                logging.info(f"Loaded {len(_handle_ids)} handle IDs from {HANDLE_IDS_FILE}")
+        return _handle_ids.get(handle)
+
+
+def _store_handle_id(handle: str, channel_id: str) -> None:
+    _cached_handle_id(handle)  # make sure the file has been loaded
+    with _handle_ids_lock:
+        _handle_ids[handle] = channel_id
+        tmp = HANDLE_IDS_FILE.with_suffix(".tmp")
+        with tmp.open("w") as f:
+            for name, cid in sorted(_handle_ids.items()):
+                f.write(f"{name} {cid}\n")
+        tmp.replace(HANDLE_IDS_FILE)
+    logging.info(f"Cached channel ID {channel_id} for @{handle}")
+
 
 def _resolve_handle(handle: str) -> str:
     """Return the channel ID for a YouTube handle."""
     logging.info(f"Resolving handle: @{handle}")
     url = f"https://www.youtube.com/@{handle}"
     req = Request(url, headers={"User-Agent": "Mozilla/5.0"})
-    with urlopen(req) as resp:
+    with urlopen(req, timeout=FEED_TIMEOUT) as resp:
         html = resp.read().decode("utf-8", errors="ignore")
     match = _re.search(r'"channelId":"(UC[^"]+)"', html)
     if not match:
@@ -88,32 +162,87 @@ def _resolve_handle(handle: str) -> str:
     return channel_id
 
 
-def _fetch_feed(channel: str) -> bytes:
+def _feed_cache_paths(channel: str) -> tuple[Path, Path]:
+    key = _re.sub(r"[^\w@.-]", "_", channel)
+    return FEED_CACHE_DIR / f"{key}.xml", FEED_CACHE_DIR / f"{key}.json"
+
+
+def _load_validators(channel: str) -> dict:
+    _, meta_path = _feed_cache_paths(channel)
+    if not meta_path.exists():
+        return {}
+    try:
+        return json.loads(meta_path.read_text())
+    except ValueError:
+        return {}
+
+
+def _commit_feed(channel: str, body: bytes, validators: dict) -> None:
+    """Store a processed feed's body and validators for the next conditional GET."""
+    FEED_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    body_path, meta_path = _feed_cache_paths(channel)
+    body_path.write_bytes(body)
+    meta_path.write_text(json.dumps(validators))
+    logging.debug(f"Stored feed validators for {channel}: {validators}")
+
+
+def _get_feed(url: str, validators: dict) -> tuple[bytes | None, dict]:
+    """
+    GET a feed URL, conditionally when ``validators`` were stored for the
+    same URL. Returns (None, validators) on 304 Not Modified.
+    """
+    headers = {}
+    if validators.get("url") == url:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    logging.info(f"Fetching feed from URL: {url}")
+    try:
+        with urlopen(Request(url, headers=headers), timeout=FEED_TIMEOUT) as resp:
+            body = resp.read()
+            return body, {"url": url, "etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+    except HTTPError as exc:
+        if exc.code == 304:
+            logging.info(f"Feed not modified: {url}")
+            return None, validators
+        raise
+
+
+def _fetch_feed(channel: str) -> tuple[bytes | None, dict]:
+    """
+    Return (feed body, validators) for a channel; the body is None when the
+    feed has not changed since it was last committed with ``_commit_feed``.
+    """
     logging.info(f"Fetching feed for channel: {channel}")
+    validators = _load_validators(channel)
     if channel.startswith("UC"):
-        url = f"https://www.youtube.com/feeds/videos.xml?channel_id={channel}"
-        logging.info(f"Fetching feed from URL: {url}")
-        with urlopen(url) as resp:
-            return resp.read()
+        return _get_feed(f"https://www.youtube.com/feeds/videos.xml?channel_id={channel}", validators)
 
     if channel.startswith("@"):
+        handle = channel[1:]
+        channel_id = _cached_handle_id(handle)
+        if channel_id:
+            try:
+                return _get_feed(f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}", validators)
+            except HTTPError as exc:
+                # Only a missing feed means the cached ID may be stale.
+                if exc.code != 404:
+                    raise
+                logging.warning(f"Feed for cached ID {channel_id} of {channel} is gone, resolving again.")
         try:
-            channel_id = _resolve_handle(channel[1:])
+            channel_id = _resolve_handle(handle)
         except Exception as exc:
             logging.error(f"Error resolving handle {channel}: {exc}")
             raise HTTPError(None, 404, str(exc), None, None)
-        url = f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
-        logging.info(f"Fetching feed from URL: {url}")
-        with urlopen(url) as resp:
-            return resp.read()
+        _store_handle_id(handle, channel_id)
+        return _get_feed(f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}", validators)
 
-    url = f"https://www.youtube.com/feeds/videos.xml?user={channel}"
-    logging.info(f"Fetching feed from URL: {url}")
-    with urlopen(url) as resp:
-        return resp.read()
+    return _get_feed(f"https://www.youtube.com/feeds/videos.xml?user={channel}", validators)
 
 
-def _parse_feed(xml_data: bytes) -> list[tuple[str, str]]:
+def _parse_feed(xml_data: bytes) -> list[tuple[str, str, bool]]:
+    """(video id, published, is short) for each feed entry."""
     logging.info("Parsing XML feed.")
     root = _ET.fromstring(xml_data)
     ns = {
@@ -124,8 +253,10 @@ def _parse_feed(xml_data: bytes) -> list[tuple[str, str]]:
     for entry in root.findall("atom:entry", ns):
         vid = entry.findtext("yt:videoId", namespaces=ns)
         published = entry.findtext("atom:published", namespaces=ns)
+        link = entry.find("atom:link[@rel='alternate']", ns)
+        is_short = link is not None and "/shorts/" in link.get("href", "")
         if vid and published:
-            results.append((vid, published))
+            results.append((vid, published, is_short))
     logging.info(f"Found {len(results)} videos in feed.")
     return results
 
@@ -142,8 +273,102 @@ def _is_recent(published: str, *, hours: int = 72) -> bool:
     return is_recent
 
 
-def _get_video_duration(file_path: Path) -> float:
-    """Return the duration of a video in seconds."""
+def _scan_channel(channel: str) -> tuple[list[tuple[str, str, bool]], tuple[bytes, dict] | None]:
+    """
+    Fetch and parse one channel's feed. Returns its videos and, when the
+    feed changed, the (body, validators) to commit once it is processed.
+    Unchanged or failed feeds give no videos.
+    """
+    logging.info(f"Processing channel: {channel}")
+    try:
+        feed, validators = _fetch_feed(channel)
+        logging.info(f"Successfully fetched feed for {channel}.")
+    except Exception as exc:  # network errors
+        logging.error(f"Failed fetching feed for {channel}: {exc}")
+        return [], None
+    if feed is None:
+        return [], None
+    videos = _parse_feed(feed)
+    logging.info(f"Found {len(videos)} videos in the feed for channel {channel}.")
+    return videos, (feed, validators)
+
+
+def _collect_candidates(channels: list[str], cache: set[str], rejected: dict[str, str]) -> tuple[list[tuple[str, str, str]], dict]:
+    """
+    Scan every channel's feed concurrently. Returns the new, recent videos
+    from all of them as one list of (video id, published, channel), oldest
+    first, and the changed feeds waiting to be committed by channel.
+    Entries the feed links as shorts are rejected here.
+    """
+    with ThreadPoolExecutor(max_workers=MAX_FEED_WORKERS) as pool:
+        feeds = list(pool.map(_scan_channel, channels))
+    candidates = {}
+    changed = {}
+    for ch, (videos, pending) in zip(channels, feeds):
+        if pending:
+            changed[ch] = pending
+        for vid, published, is_short in videos:
+            if vid in cache:
+                logging.info(f"Video {vid} already in cache. Skipping.")
+                continue
+            if vid in rejected:
+                logging.info(f"Video {vid} was rejected before ({rejected[vid]}). Skipping.")
+                continue
+            if not _is_recent(published):
+                logging.info(f"Video {vid} is not recent. Skipping.")
+                continue
+            if is_short:
+                _reject(REJECTED_FILE, vid, "shorts link in feed")
+                rejected[vid] = "shorts link in feed"
+                continue
+            candidates.setdefault(vid, (published, ch))
+    logging.info(f"{len(candidates)} new recent videos across {len(channels)} channels, {len(changed)} feeds changed.")
+    ordered = sorted(candidates.items(), key=lambda item: item[1][0])
+    return [(vid, published, ch) for vid, (published, ch) in ordered], changed
+
+
+def _ydl_opts(**extra) -> dict:
+    opts = {"quiet": True, "no_warnings": True, "noprogress": True}
+    opts.update(extra)
+    return opts
+
+
+def _ratelimit() -> int | None:
+    """Per-download rate so the workers together stay under YT_WATCHLIST_RATELIMIT."""
+    from yt_dlp.utils import parse_bytes
+
+    value = os.environ.get("YT_WATCHLIST_RATELIMIT")
+    if not value:
+        return None
+    total = parse_bytes(value)
+    if total is None:
+        logging.warning(f"Ignoring invalid YT_WATCHLIST_RATELIMIT: {value}")
+        return None
+    return max(total // MAX_DOWNLOAD_WORKERS, 1)
+
+
+def _probe_duration(video_id: str) -> float | None:
+    """Duration in seconds from yt-dlp metadata, without downloading; None if unknown."""
+    from yt_dlp import YoutubeDL
+
+    url = f"https://www.youtube.com/watch?v={video_id}"
+    try:
+        with YoutubeDL(_ydl_opts(socket_timeout=FEED_TIMEOUT)) as ydl:
+            info = ydl.extract_info(url, download=False, process=False)
+    except Exception as e:
+        # Runs on the probe pool: one bad video must not abort the others.
+        logging.warning(f"No metadata for {video_id}: {e}")
+        return None
+    duration = (info or {}).get("duration")
+    if duration is None:
+        logging.warning(f"No duration in metadata for {video_id}.")
+        return None
+    logging.info(f"Metadata duration of {video_id} is {duration} seconds.")
+    return float(duration)
+
+
+def _get_video_duration(file_path: Path) -> float | None:
+    """Return the duration of a video in seconds, or None if ffprobe can't tell."""
     logging.info(f"Getting duration for video: {file_path}")
     cmd = [
         "ffprobe",
@@ -156,36 +381,64 @@ def _get_video_duration(file_path: Path) -> float:
         str(file_path),
     ]
     try:
-        result = _sp.run(cmd, capture_output=True, text=True, check=True)
+        result = _sp.run(cmd, capture_output=True, text=True, check=True, timeout=PROBE_TIMEOUT)
         duration = float(result.stdout)
         logging.info(f"Duration of {file_path} is {duration} seconds.")
         return duration
-    except (_sp.CalledProcessError, ValueError) as e:
+    except (_sp.CalledProcessError, _sp.TimeoutExpired, ValueError) as e:
         logging.error(f"Error getting duration for {file_path}: {e}")
-        return 0.0
+        return None
+
+
+def _progress_hook(video_id: str):
+    """Log each quarter of a download and its end, not every progress tick."""
+    logged = set()
 
+    def hook(d: dict) -> None:
+        if d["status"] == "downloading":
+            total = d.get("total_bytes") or d.get("total_bytes_estimate")
+            if total:
+                quarter = int(4 * d.get("downloaded_bytes", 0) / total)
+                if 0 < quarter < 4 and quarter not in logged:
+                    logged.add(quarter)
+                    logging.info(f"Downloading {video_id}: {quarter * 25}%")
+        elif d["status"] == "finished":
+            logging.info(f"Finished downloading {video_id} to {d.get('filename')}")
+        elif d["status"] == "error":
+            logging.error(f"Download error for {video_id}")
+
+    return hook
+
+
+def _download(video_id: str, ratelimit: int | None = None) -> Path | None:
+    """Download one video in 360p; the file path, or None on failure."""
+    from yt_dlp import YoutubeDL
+    from yt_dlp.utils import DownloadError
 
-def _download(video_id: str) -> Path | None:
     DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
     url = f"https://www.youtube.com/watch?v={video_id}"
-    out_tpl = DOWNLOAD_DIR / "%(title)s [%(id)s].%(ext)s"
-    cmd = ["yt-dlp", "-f", "18", url, "-o", str(out_tpl)]
+    opts = _ydl_opts(
+        format="18",
+        outtmpl=str(DOWNLOAD_DIR / "%(title)s [%(id)s].%(ext)s"),
+        ratelimit=ratelimit,
+        progress_hooks=[_progress_hook(video_id)],
+    )
     logging.info(f"Attempting to download video: {video_id}")
-    proc = _sp.run(cmd, check=False, capture_output=True, text=True)
-    if proc.returncode != 0:
-        logging.error(f"yt-dlp failed for {video_id}: {proc.stderr}")
+    try:
+        # One YoutubeDL per download; instances are not shared between threads.
+        with YoutubeDL(opts) as ydl:
+            info = ydl.extract_info(url, download=True)
+    except DownloadError as e:
+        logging.error(f"yt-dlp failed for {video_id}: {e}")
         return None
 
-    # Find the downloaded file
-    for line in proc.stdout.splitlines():
-        if "Destination:" in line:
-            filepath_str = line.split("Destination:", 1)[1].strip()
-            return Path(filepath_str)
-        if "has already been downloaded" in line:
-            match = _re.search(r"Destination: (.+)", proc.stdout)
-            if match:
-                return Path(match.group(1))
-    return None
+    # Also filled in when the file was already downloaded.
+    downloads = (info or {}).get("requested_downloads") or []
+    filepath = downloads[0].get("filepath") if downloads else None
+    if not filepath or not Path(filepath).exists():
+        logging.error(f"yt-dlp reported no file for {video_id}")
+        return None
+    return Path(filepath)
 
 
 def main() -> None:
@@ -198,38 +451,59 @@ def main() -> None:
         return
     print("Channels loaded")
     cache = _load_cache(CACHE_FILE)
+    rejected = _load_rejected(REJECTED_FILE)
     print("Loaded cache")
-    for ch in channels:
-        logging.info(f"Processing channel: {ch}")
-        try:
-            feed = _fetch_feed(ch)
-            logging.info(f"Successfully fetched feed for {ch}.")
-        except Exception as exc:  # network errors
-            logging.error(f"Failed fetching feed for {ch}: {exc}")
+    candidates, changed = _collect_candidates(channels, cache, rejected)
+    with ThreadPoolExecutor(max_workers=MAX_FEED_WORKERS) as pool:
+        durations = list(pool.map(_probe_duration, [vid for vid, _, _ in candidates]))
+    failed_channels = set()
+    wanted = []
+    for (vid, published, ch), duration in zip(candidates, durations):
+        if duration is not None and duration < MIN_DURATION:
+            _reject(REJECTED_FILE, vid, f"duration {duration:g}s")
             continue
-        videos = _parse_feed(feed)
-        logging.info(f"Found {len(videos)} videos in the feed for channel {ch}.")
-        for vid, published in videos:
-            if vid in cache:
-                logging.info(f"Video {vid} already in cache. Skipping.")
-                continue
-            if not _is_recent(published):
-                logging.info(f"Video {vid} is not recent. Skipping.")
+        logging.info(f"Found new recent video: {vid}")
+        wanted.append((vid, ch, duration))
+
+    ratelimit = _ratelimit()
+    # Workers only download; the cache files are written here as results come in.
+    with ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS) as pool:
+        jobs = {pool.submit(_download, vid, ratelimit): (vid, ch, duration) for vid, ch, duration in wanted}
+        for job in as_completed(jobs):
+            vid, ch, duration = jobs[job]
+            try:
+                downloaded_file = job.result()
+            except Exception as e:
+                logging.error(f"Download of {vid} crashed: {e}")
+                downloaded_file = None
+            if not downloaded_file:
+                failed_channels.add(ch)
                 continue
-            logging.info(f"Found new recent video: {vid}")
-            downloaded_file = _download(vid)
-            if downloaded_file:
+            if duration is None:
+                # Metadata had no duration; check the file instead.
                 duration = _get_video_duration(downloaded_file)
-                if duration < 60:
-                    logging.info(
-                        f"Video {vid} is shorter than 1 minute ({duration}s), deleting."
-                    )
-                    downloaded_file.unlink()
-                    logging.info(f"Deleted video file: {downloaded_file}")
-                else:
-                    _append_cache(CACHE_FILE, vid)
-                    cache.add(vid)
-                    logging.info(f"Added video {vid} to cache.")
+            if duration is None:
+                # Still unknown: keep the file, leave the video out of both
+                # caches and keep the channel's feed pending so the next run
+                # checks it again.
+                logging.warning(f"Duration of {vid} unknown, will check again next run.")
+                failed_channels.add(ch)
+            elif duration < MIN_DURATION:
+                logging.info(
+                    f"Video {vid} is shorter than 1 minute ({duration}s), deleting."
+                )
+                downloaded_file.unlink()
+                logging.info(f"Deleted video file: {downloaded_file}")
+                _reject(REJECTED_FILE, vid, f"duration {duration:g}s")
+            else:
+                _append_cache(CACHE_FILE, vid)
+                cache.add(vid)
+                logging.info(f"Added video {vid} to cache.")
+    # A channel with a failed download keeps its old validators so the next
+    # run sees the feed as changed and retries.
+    for ch, (feed, validators) in changed.items():
+        if ch not in failed_channels:
+            _commit_feed(ch, feed, validators)
     logging.info("Script finished.")
     _sp.run(["notify-send", "YouTube Watchlist", "Scraping finished."], check=False)
 